@@ -0,0 +1,109 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tomllib
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.generate_deck import create_srs_db
+from src.srs_app import SrsApp
+from src.dataclasses import SrsConfig
+from src.review_session import ReviewSession
+
+# per-answer latency of the db work behind one completed item:
+# write the new grade (one UPDATE ... RETURNING), then pull the next due item into the session,
+# hydrating the next chunk of due rows when the prefetch buffer runs out
+#
+# the grade write is the same in both variants, they only differ in how the hydration reads rows:
+# "pandas" reads them through a DataFrame like the old hot path, "rows" through sqlite3.Row
+# usage: python bench/bench_answer.py --rows 10000 --answers 1000
+
+
+# the old hot path read every row through a DataFrame
+# swap the row layer for that on one instance, so both variants run the exact same app code
+def use_pandas_reads(srs_app: SrsApp) -> None:
+    def fetch_rows(q: str, params: tuple = ()) -> list[dict]:
+        return pd.read_sql_query(q, srs_app.conn, params = params).to_dict("records")
+
+    srs_app.fetch_rows = fetch_rows
+
+    return None
+
+def run(srs_app: SrsApp, n_answers: int) -> list[float]:
+    session = ReviewSession(key = (None, 0, 0))
+    srs_app.start_review_session(session)
+
+    timings = []
+    completed = set()
+
+    while session.queue and len(timings) < n_answers:
+
+        # each item has a reading and a meaning card, only grade it once
+        item_id = session.queue.pop().item_id
+
+        if item_id in completed:
+            continue
+
+        completed.add(item_id)
+
+        start = time.perf_counter()
+        srs_app.update_review_item(session, item_id, True)
+        srs_app.update_review_session(session)
+        timings.append(time.perf_counter() - start)
+
+    srs_app.force_commit()
+
+    return timings
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    n = len(timings)
+
+    print(f"{name:>8}: n = {n}, mean = {sum(timings) / n * 1e6:.1f} us, p50 = {timings[n // 2] * 1e6:.1f} us, p95 = {timings[int(n * 0.95)] * 1e6:.1f} us")
+
+    return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type = int, default = 10000, help = "Rows in the synthetic deck")
+    parser.add_argument("--answers", type = int, default = 1000, help = "Completed items to time (at most the due ones)")
+
+    args = parser.parse_args()
+
+    with open("config.toml", "rb") as f:
+        config = tomllib.load(f)
+
+    for name in ["pandas", "rows"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path_to_srs_db = os.path.join(tmp, "srs.db")
+            path_to_full_db = os.path.join(tmp, "full.db")
+            create_srs_db(path_to_srs_db, args.rows)
+
+            # the answer path never touches the dictionary, but it is opened read-only, so it has to exist
+            sqlite3.connect(path_to_full_db).close()
+
+            config_srs = SrsConfig(
+                srs_interval = config["srs_interval"],
+                path_to_srs_db = path_to_srs_db,
+                path_to_full_db = path_to_full_db,
+                max_reviews_at_once = config["max_reviews_at_once"],
+                entries_before_commit = config["entries_before_commit"],
+            )
+
+            srs_app = SrsApp(config_srs)
+            srs_app.init_db()
+
+            if name == "pandas":
+                use_pandas_reads(srs_app)
+
+            report(name, run(srs_app, args.answers))
+
+            srs_app.close_db()
+
+if __name__ in {"__main__"}:
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+from pyokaka import okaka
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.kana import KanaTransliterator, load_romaji_table, romaji_to_kana
+
+# conformance of src.kana against pyokaka, then throughput of both
+# exits with 1 if any input converts differently
+# usage: python bench/bench_romaji.py --words 50000
+
+
+# the previous romaji_to_kana: rewrite "nn" to "nn'", then hand it to pyokaka
+def pyokaka_romaji_to_kana(string: str) -> str:
+    processed_string = ""
+    prev = ""
+
+    for char in string.lower():
+        if char + prev == "nn":
+            prev = ""
+            processed_string += "n'"
+
+        else:
+            prev = char
+            processed_string += char
+
+    return okaka.convert(processed_string)
+
+# every key of the table, every pair of keys, plus n runs and a few odd characters around them
+def conformance_inputs(romaji_table: dict) -> list[str]:
+    keys = sorted(romaji_table)
+    extras = ["n", "nn", "nnn", "nnnn", "'", "-", "x", "l", "1", " ", "N", "Ka"]
+
+    inputs = list(keys) + extras
+
+    for first in keys + extras:
+        for second in keys + extras:
+            inputs.append(first + second)
+
+    return inputs
+
+def random_words(romaji_table: dict, n_words: int) -> list[str]:
+    keys = sorted(romaji_table)
+    rng = random.Random(0)
+
+    return ["".join(rng.choice(keys) for _ in range(rng.randint(1, 5))) for _ in range(n_words)]
+
+def check(inputs: list[str]) -> int:
+    mismatches = 0
+
+    for string in inputs:
+        expected = pyokaka_romaji_to_kana(string)
+        actual = romaji_to_kana(string)
+
+        if expected != actual:
+            mismatches += 1
+
+            if mismatches <= 20:
+                print(f"mismatch: {string!r}: pyokaka {expected!r}, trie {actual!r}")
+
+    print(f"conformance: {len(inputs) - mismatches} / {len(inputs)} match")
+
+    return mismatches
+
+def throughput(name: str, f, words: list[str]) -> None:
+    start = time.perf_counter()
+
+    for word in words:
+        f(word)
+
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:>14}: {len(words) / elapsed:,.0f} words/s ({elapsed / len(words) * 1e6:.2f} us/word)")
+
+    return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type = int, default = 50000, help = "Random words for the throughput run")
+
+    args = parser.parse_args()
+
+    romaji_table = load_romaji_table()
+    words = random_words(romaji_table, args.words)
+
+    mismatches = check(conformance_inputs(romaji_table) + words)
+
+    transliterator = KanaTransliterator(romaji_table)
+
+    throughput("pyokaka", pyokaka_romaji_to_kana, words)
+    throughput("trie", transliterator.convert, words)
+
+    # answers repeat, so the cached path is what a session actually sees
+    romaji_to_kana.cache_clear()
+    throughput("trie + cache", romaji_to_kana, words[:1000] * (len(words) // 1000))
+
+    sys.exit(1 if mismatches else 0)
+
+if __name__ in {"__main__"}:
+    main()
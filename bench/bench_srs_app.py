@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tomllib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.generate_deck import generate
+from src.srs_app import SrsApp
+from src.dataclasses import SrsConfig
+from src.review_session import ReviewSession
+
+# SrsApp at scale: generates (or reuses) a synthetic deck, times the main entry points,
+# writes the results as json and optionally compares them with an earlier run
+# usage: python bench/bench_srs_app.py --size 100000 --compare bench/results/<earlier>.json
+
+
+def measure(f, repeat: int) -> dict:
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+
+    return {
+        "n": repeat,
+        "min_ms": timings[0] * 1e3,
+        "mean_ms": sum(timings) / repeat * 1e3,
+        "p50_ms": timings[repeat // 2] * 1e3,
+        "p95_ms": timings[min(int(repeat * 0.95), repeat - 1)] * 1e3,
+    }
+
+def run_suite(srs_app: SrsApp, repeat: int) -> dict:
+    results = dict()
+
+    results["start_review_session"] = measure(lambda: srs_app.start_review_session(ReviewSession(key = (None, 0, 0))), repeat)
+
+    # grade the due items of one session, alternating results so grades stay in range
+    session = ReviewSession(key = (None, 0, 0))
+    srs_app.start_review_session(session)
+    item_ids = [card.item_id for card in session.queue] + session.due_review_ids
+    answers = iter(enumerate(item_ids * (repeat // max(len(item_ids), 1) + 1)))
+
+    def update_review_item():
+        i, item_id = next(answers)
+        srs_app.update_review_item(session, item_id, i % 2 == 0)
+
+    if item_ids:
+        results["update_review_item"] = measure(update_review_item, repeat)
+
+    srs_app.force_commit()
+
+    results["get_review_stats"] = measure(srs_app.get_review_stats, max(repeat // 10, 3))
+    results["get_stats"] = measure(srs_app.get_stats, repeat)
+
+    # one page of discovery, and a full pass over it in pages
+    results["discover_vocab_page"] = measure(srs_app.discover_vocab_page, repeat)
+    results["discover_kanji_page"] = measure(srs_app.discover_kanji_page, repeat)
+    results["iter_new_vocab"] = measure(lambda: sum(1 for _ in srs_app.iter_new_items("vocab")), 3)
+    results["iter_new_kanji"] = measure(lambda: sum(1 for _ in srs_app.iter_new_items("kanji")), 3)
+
+    return results
+
+# flags every op whose p50 got slower than the earlier run by more than the tolerance
+def compare(results: dict, path_to_previous: str, tolerance: float) -> list[str]:
+    with open(path_to_previous) as f:
+        previous = json.load(f)["results"]
+
+    regressions = []
+
+    for name, result in results.items():
+        if name not in previous:
+            continue
+
+        before = previous[name]["p50_ms"]
+        after = result["p50_ms"]
+        change = (after - before) / before if before else 0
+
+        print(f"{name:>22}: {before:10.3f} ms -> {after:10.3f} ms ({change:+.1%})")
+
+        if change > tolerance:
+            regressions.append(name)
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type = int, default = 1000, help = "Deck size to generate (1000, 100000, 1000000)")
+    parser.add_argument("--data", help = "Reuse a deck made by generate_deck.py instead of generating one")
+    parser.add_argument("--repeat", type = int, default = 200, help = "Rounds for the fast operations")
+    parser.add_argument("--out", default = "bench/results", help = "Directory for the json results")
+    parser.add_argument("--compare", help = "Earlier results json to compare against")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "Allowed p50 slowdown before flagging a regression")
+    parser.add_argument("--dictionary-in-memory", action = "store_true", help = "Run discovery against an in-memory copy of the dictionary")
+
+    args = parser.parse_args()
+
+    with open("config.toml", "rb") as f:
+        config = tomllib.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        # the suite writes to the deck, so always work on a copy
+        if args.data:
+            path_to_srs_db = os.path.join(tmp, "srs.db")
+            path_to_full_db = os.path.join(args.data, "KanjiDatabase.sqlite")
+            shutil.copyfile(os.path.join(args.data, "srs.db"), path_to_srs_db)
+
+        else:
+            start = time.perf_counter()
+            path_to_srs_db, path_to_full_db = generate(tmp, args.size)
+            print(f"Generated a {args.size} row deck in {time.perf_counter() - start:.1f}s")
+
+        config_srs = SrsConfig(
+            srs_interval = config["srs_interval"],
+            path_to_srs_db = path_to_srs_db,
+            path_to_full_db = path_to_full_db,
+            max_reviews_at_once = config["max_reviews_at_once"],
+            entries_before_commit = config["entries_before_commit"],
+            dictionary_in_memory = args.dictionary_in_memory,
+        )
+
+        srs_app = SrsApp(config_srs)
+        srs_app.init_db()
+
+        results = run_suite(srs_app, args.repeat)
+
+        srs_app.close_db()
+
+    for name, result in results.items():
+        print(f"{name:>22}: p50 {result['p50_ms']:10.3f} ms, p95 {result['p95_ms']:10.3f} ms (n = {result['n']})")
+
+    os.makedirs(args.out, exist_ok = True)
+    path_to_results = os.path.join(args.out, f"srs_app-{args.size if not args.data else os.path.basename(os.path.normpath(args.data))}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+    with open(path_to_results, "w") as f:
+        json.dump({
+            "size": args.size,
+            "data": args.data,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "dictionary_in_memory": args.dictionary_in_memory,
+            "results": results,
+        }, f, indent = 4)
+
+    print(f"Results written to {path_to_results}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ in {"__main__"}:
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import process, fuzz
+
+from bench.generate_deck import meaning_for
+from src.meaning_index import MeaningIndex
+
+# checks MeaningIndex.lookup (length buckets) against an unpruned extractOne over every other item's meanings
+# answers are deck meanings with a few characters added, dropped or changed, so their scores land around the threshold
+# usage: python bench/check_meaning_index.py --items 2000 --answers 5000 --threshold 85
+
+
+def mutate(rng: random.Random, meaning: str) -> str:
+    chars = list(meaning)
+
+    for _ in range(rng.randint(0, 4)):
+        edit = rng.choice(("add", "drop", "change"))
+        position = rng.randrange(len(chars) + 1)
+
+        if edit == "add":
+            chars.insert(position, rng.choice("abcdefghijklmnopqrstuvwxyz "))
+
+        elif chars and position < len(chars):
+            if edit == "drop":
+                del chars[position]
+
+            else:
+                chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+
+    return "".join(chars)
+
+# best score among the meanings of every item but exclude_id, or None
+def brute_force(items: dict, answer: str, exclude_id: int, threshold: int) -> float:
+    meanings = [meaning for item_id, meanings in items.items() if item_id != exclude_id for meaning in meanings]
+    match = process.extractOne(answer, meanings, scorer = fuzz.QRatio, score_cutoff = threshold)
+
+    return None if match is None else match[1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type = int, default = 2000, help = "Items in the deck")
+    parser.add_argument("--answers", type = int, default = 5000, help = "Answers to look up")
+    parser.add_argument("--threshold", type = int, default = 85, help = "match_score_threshold")
+    parser.add_argument("--seed", type = int, default = 0)
+
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    items = {item_id: {meaning_for(rng) for _ in range(rng.randint(1, 3))} for item_id in range(1, args.items + 1)}
+
+    # long runs of one letter, where a few extra characters still score over the threshold
+    items[args.items + 1] = {"aaaaaaaaaa"}
+    items[args.items + 2] = {"aaaaaaaaaabbb"}
+
+    meaning_index = MeaningIndex(args.threshold)
+    meaning_index.rebuild([(item_id, str(item_id), {meaning: meaning for meaning in meanings}) for item_id, meanings in items.items()])
+
+    cases = [("aaaaaaaaaa", args.items + 1), ("aaaaaaaaaabbb", args.items + 2)]
+
+    for _ in range(args.answers):
+        item_id = rng.randint(1, args.items)
+        cases.append((mutate(rng, rng.choice(sorted(items[item_id]))), rng.choice((item_id, None))))
+
+    n_mismatches = 0
+
+    for answer, exclude_id in cases:
+        match = meaning_index.lookup(answer, exclude_id)
+        score = None if match is None else match[2]
+        expected = brute_force(items, answer.strip().lower(), exclude_id, args.threshold)
+
+        if score != expected:
+            n_mismatches += 1
+
+            if n_mismatches <= 10:
+                print(f"{answer!r} excluding {exclude_id}: lookup {score}, brute force {expected}")
+
+    print(f"{len(cases)} answers, {n_mismatches} mismatches")
+
+    if n_mismatches:
+        sys.exit(1)
+
+if __name__ in {"__main__"}:
+    main()
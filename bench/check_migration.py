@@ -0,0 +1,140 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import tomllib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.generate_deck import create_srs_db
+from src.srs_app import SrsApp
+from src.dataclasses import SrsConfig
+
+# checks that an interrupted convert_from_houhou (main.py migrate) resumes and converts every row
+# a synthetic deck is turned back into houhou's shape (no iso/epoch columns), then the migration is interrupted
+# at a given chunk, run again, and the result compared with the houhou dates
+# usage: python bench/check_migration.py --size 1000 --chunk-size 100
+
+
+# stands in for the app's connection and raises in the middle of the chunk'th chunk update, like a ctrl-c would
+class InterruptingConnection:
+    def __init__(self, conn: sqlite3.Connection, chunk: int):
+        self.conn = conn
+        self.chunk = chunk
+        self.n_updates = 0
+
+    def execute(self, q: str, *args):
+        if q.lstrip().startswith("UPDATE") and "ISO =" in q:
+            self.n_updates += 1
+
+            if self.n_updates == self.chunk:
+                raise KeyboardInterrupt
+
+        return self.conn.execute(q, *args)
+
+    def __getattr__(self, name: str):
+        return getattr(self.conn, name)
+
+def to_houhou_shape(path_to_srs_db: str) -> None:
+    conn = sqlite3.connect(path_to_srs_db)
+
+    for name_index, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL;").fetchall():
+        conn.execute(f"DROP INDEX {name_index};")
+
+    for row in conn.execute("PRAGMA table_info(SrsEntrySet);").fetchall():
+        if row[1].endswith("ISO") or row[1] == "NextAnswerEpoch":
+            conn.execute(f"ALTER TABLE SrsEntrySet DROP COLUMN {row[1]};")
+
+    conn.commit()
+    conn.close()
+
+    return None
+
+def check(srs_app: SrsApp) -> list[str]:
+    q = f"""
+        SELECT
+            COUNT(*),
+            SUM(NextAnswerDateISO IS NULL),
+            SUM(NextAnswerEpoch IS NOT CAST(strftime('%s', NextAnswerDateISO) AS INTEGER)),
+            SUM(LastUpdateDateISO IS NULL)
+        FROM {srs_app.name_srs_table}
+        WHERE typeof(NextAnswerDate) = 'integer';
+        """
+
+    n_rows, n_missing_iso, n_wrong_epoch, n_missing_update = srs_app.conn.execute(q).fetchone()
+    problems = []
+
+    if n_missing_iso:
+        problems.append(f"{n_missing_iso} of {n_rows} rows without NextAnswerDateISO")
+
+    if n_wrong_epoch:
+        problems.append(f"{n_wrong_epoch} of {n_rows} rows with NextAnswerEpoch out of sync")
+
+    if n_missing_update:
+        problems.append(f"{n_missing_update} of {n_rows} rows without LastUpdateDateISO")
+
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type = int, default = 1000, help = "Rows in the deck")
+    parser.add_argument("--chunk-size", type = int, default = 100, help = "Rows per migration chunk")
+
+    args = parser.parse_args()
+
+    with open("config.toml", "rb") as f:
+        config = tomllib.load(f)
+
+    n_chunks = -(-args.size // args.chunk_size)
+    failed = False
+
+    # the first chunk (nothing checkpointed yet), one in the middle and the last one
+    for chunk in sorted({1, n_chunks // 2 + 1, n_chunks}):
+        with tempfile.TemporaryDirectory() as tmp:
+            path_to_srs_db = os.path.join(tmp, "srs.db")
+            path_to_full_db = os.path.join(tmp, "KanjiDatabase.sqlite")
+
+            create_srs_db(path_to_srs_db, args.size)
+            to_houhou_shape(path_to_srs_db)
+
+            # the migration never reads the dictionary, but it is opened read-only, so it has to exist
+            sqlite3.connect(path_to_full_db).close()
+
+            config_srs = SrsConfig(
+                srs_interval = config["srs_interval"],
+                path_to_srs_db = path_to_srs_db,
+                path_to_full_db = path_to_full_db,
+            )
+
+            srs_app = SrsApp(config_srs)
+            srs_app.init_db(load_caches = False)
+
+            conn = srs_app.conn
+            srs_app.conn = InterruptingConnection(conn, chunk)
+
+            try:
+                srs_app.convert_from_houhou(chunk_size = args.chunk_size)
+
+            except KeyboardInterrupt:
+                pass
+
+            srs_app.conn = conn
+            srs_app.close_db()
+
+            srs_app = SrsApp(config_srs)
+            srs_app.init_db(load_caches = False)
+            summary = srs_app.convert_from_houhou(chunk_size = args.chunk_size)
+            problems = check(srs_app)
+            srs_app.close_db()
+
+            status = "ok" if not problems else "FAILED: " + "; ".join(problems)
+            print(f"interrupted in chunk {chunk}/{n_chunks}, resumed after rowid {summary['resumed_after']}: {status}")
+
+            failed = failed or bool(problems)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ in {"__main__"}:
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+from datetime import datetime, timedelta, timezone
+
+# synthetic databases shaped like the real ones:
+# - srs.db: houhou's SrsEntrySet, already converted (tick columns and their ISO copies)
+# - KanjiDatabase.sqlite: VocabSet, VocabMeaningSet, KanjiSet, KanjiMeaningSet and their link tables
+#
+# --size is the number of vocab rows in the dictionary and of items in the deck
+# usage: python bench/generate_deck.py --size 100000 --out bench/data/100k
+
+
+HIRAGANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+WORDS = [
+    "water", "fire", "tree", "mountain", "river", "person", "eat", "drink", "see", "go",
+    "come", "big", "small", "new", "old", "high", "cheap", "long", "short", "red",
+    "blue", "white", "black", "day", "night", "year", "time", "hand", "eye", "ear",
+    "mouth", "heart", "book", "word", "car", "train", "road", "house", "door", "shop",
+    "money", "study", "work", "rest", "meet", "speak", "write", "read", "listen", "think",
+]
+CATEGORIES = [("n", "noun"), ("v1", "ichidan verb"), ("v5", "godan verb"), ("adj-i", "i-adjective"), ("adv", "adverb")]
+
+# .NET ticks, which is what houhou stores its dates as
+def to_ticks(when: datetime) -> int:
+    return (int(when.timestamp()) + 62135596800) * 10000000
+
+def to_iso(when: datetime) -> str:
+    return when.strftime("%Y-%m-%d %H:%M:%S")
+
+# unique, deterministic strings for row i
+def kana_for(i: int) -> str:
+    chars = []
+
+    while True:
+        i, rest = divmod(i, len(HIRAGANA))
+        chars.append(HIRAGANA[rest])
+
+        if i == 0:
+            return "".join(chars)
+
+def kanji_for(i: int) -> str:
+
+    # cjk unified ideographs, then extension b onwards
+    if i < 20992:
+        return chr(0x4E00 + i)
+
+    return chr(0x20000 + i - 20992)
+
+def vocab_for(i: int) -> str:
+    return kanji_for(i % 20992) + kana_for(i // 20992)
+
+def meaning_for(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2)))
+
+def create_srs_db(path: str, n_items: int, n_kanji: int = 0, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    conn = sqlite3.connect(path)
+    conn.execute("""
+                 CREATE TABLE SrsEntrySet (
+                     ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                     CreationDate INTEGER,
+                     NextAnswerDate INTEGER,
+                     Meanings TEXT,
+                     Readings TEXT,
+                     CurrentGrade INTEGER NOT NULL DEFAULT 0,
+                     FailureCount INTEGER NOT NULL DEFAULT 0,
+                     SuccessCount INTEGER NOT NULL DEFAULT 0,
+                     AssociatedVocab TEXT,
+                     AssociatedKanji TEXT,
+                     MeaningNote TEXT,
+                     ReadingNote TEXT,
+                     SuspensionDate INTEGER,
+                     Tags TEXT,
+                     LastUpdateDate INTEGER,
+                     IsDeleted INTEGER NOT NULL DEFAULT 0,
+                     ServerId INTEGER,
+                     LastUpdateDateISO TEXT,
+                     CreationDateISO TEXT,
+                     NextAnswerDateISO TEXT,
+                     SuspensionDateISO TEXT
+                 );
+                 """)
+
+    def rows():
+        for i in range(n_items):
+
+            # study most of the dictionary's vocab and, at the end, some of its kanji
+            is_kanji = i >= n_items - n_kanji
+            grade = rng.randint(0, 8)
+            created = now - timedelta(days = rng.randint(30, 720))
+            updated = created + timedelta(days = rng.randint(0, 29))
+            next_answer = None
+
+            # grade 8 items are done, everything else is due somewhere between a month ago and 4 months from now
+            if grade < 8:
+                next_answer = now + timedelta(hours = rng.randint(-24 * 30, 24 * 120))
+
+            yield (
+                to_ticks(created),
+                to_ticks(next_answer) if next_answer else None,
+                ",".join(meaning_for(rng) for _ in range(rng.randint(1, 3))),
+                ",".join(kana_for(rng.randrange(n_items)) for _ in range(rng.randint(1, 2))),
+                grade,
+                rng.randint(0, 10),
+                rng.randint(0, 30),
+                None if is_kanji else vocab_for(i),
+                kanji_for(i - (n_items - n_kanji)) if is_kanji else None,
+                to_ticks(updated),
+                to_iso(updated),
+                to_iso(created),
+                to_iso(next_answer) if next_answer else None,
+            )
+
+    conn.executemany("""
+                     INSERT INTO SrsEntrySet (
+                         CreationDate, NextAnswerDate, Meanings, Readings, CurrentGrade, FailureCount, SuccessCount,
+                         AssociatedVocab, AssociatedKanji, LastUpdateDate, LastUpdateDateISO, CreationDateISO, NextAnswerDateISO
+                     )
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                     """, rows())
+    conn.commit()
+    conn.close()
+
+    return None
+
+def create_full_db(path: str, n_vocab: int, n_kanji: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+                       CREATE TABLE VocabSet (
+                           ID INTEGER PRIMARY KEY,
+                           KanjiWriting TEXT,
+                           KanaWriting TEXT,
+                           IsCommon INTEGER,
+                           FrequencyRank INTEGER,
+                           Furigana TEXT,
+                           JlptLevel INTEGER,
+                           WikiRank INTEGER,
+                           GroupedVocab INTEGER
+                       );
+                       CREATE TABLE VocabMeaningSet (ID INTEGER PRIMARY KEY, Meaning TEXT);
+                       CREATE TABLE VocabEntityVocabMeaning (VocabEntity_ID INTEGER, Meanings_ID INTEGER);
+                       CREATE TABLE VocabCategorySet (ID INTEGER PRIMARY KEY, ShortName TEXT, Label TEXT);
+                       CREATE TABLE VocabMeaningVocabCategory (VocabMeaningVocabCategory_VocabCategory_ID INTEGER, Categories_ID INTEGER);
+                       CREATE TABLE KanjiSet (
+                           ID INTEGER PRIMARY KEY,
+                           Character TEXT,
+                           StrokeCount INTEGER,
+                           Grade INTEGER,
+                           JlptLevel INTEGER,
+                           MostUsedRank INTEGER,
+                           OnYomi TEXT,
+                           KunYomi TEXT,
+                           Nanori TEXT,
+                           UnicodeValue INTEGER,
+                           NewspaperRank INTEGER,
+                           WaniKaniLevel INTEGER
+                       );
+                       CREATE TABLE KanjiMeaningSet (ID INTEGER PRIMARY KEY, Kanji_ID INTEGER, Language TEXT, Meaning TEXT);
+                       """)
+
+    conn.executemany("INSERT INTO VocabCategorySet (ID, ShortName, Label) VALUES (?, ?, ?);", [(i + 1, short, label) for i, (short, label) in enumerate(CATEGORIES)])
+
+    def jlpt_level():
+        return rng.choice([1, 2, 3, 4, 5, None])
+
+    conn.executemany("""
+                     INSERT INTO VocabSet (ID, KanjiWriting, KanaWriting, IsCommon, FrequencyRank, JlptLevel, WikiRank)
+                     VALUES (?, ?, ?, ?, ?, ?, ?);
+                     """, ((i + 1, vocab_for(i), kana_for(i), rng.randint(0, 1), i + 1, jlpt_level(), rng.randint(1, n_vocab)) for i in range(n_vocab)))
+
+    # 1-3 meanings per vocab, each with one category
+    meanings = []
+    links = []
+
+    for i in range(n_vocab):
+        for _ in range(rng.randint(1, 3)):
+            meaning_id = len(meanings) + 1
+            meanings.append((meaning_id, meaning_for(rng)))
+            links.append((i + 1, meaning_id))
+
+    conn.executemany("INSERT INTO VocabMeaningSet (ID, Meaning) VALUES (?, ?);", meanings)
+    conn.executemany("INSERT INTO VocabEntityVocabMeaning (VocabEntity_ID, Meanings_ID) VALUES (?, ?);", links)
+    conn.executemany("""
+                     INSERT INTO VocabMeaningVocabCategory (VocabMeaningVocabCategory_VocabCategory_ID, Categories_ID)
+                     VALUES (?, ?);
+                     """, ((meaning_id, rng.randint(1, len(CATEGORIES))) for meaning_id, _ in meanings))
+
+    conn.executemany("""
+                     INSERT INTO KanjiSet (ID, Character, StrokeCount, Grade, JlptLevel, MostUsedRank, OnYomi, KunYomi, UnicodeValue)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+                     """, ((i + 1, kanji_for(i), rng.randint(1, 30), rng.randint(1, 9), jlpt_level(), i + 1, kana_for(i), kana_for(i + 1), ord(kanji_for(i))) for i in range(n_kanji)))
+    conn.executemany("""
+                     INSERT INTO KanjiMeaningSet (Kanji_ID, Language, Meaning)
+                     VALUES (?, 'en', ?);
+                     """, ((i + 1, meaning_for(rng)) for i in range(n_kanji) for _ in range(rng.randint(1, 3))))
+
+    conn.commit()
+    conn.close()
+
+    return None
+
+# the deck studies ~80% of the dictionary's vocab and ~half of its kanji, so discovery has work to do
+def generate(out_dir: str, size: int, seed: int = 0) -> tuple[str, str]:
+    os.makedirs(out_dir, exist_ok = True)
+
+    path_to_srs_db = os.path.join(out_dir, "srs.db")
+    path_to_full_db = os.path.join(out_dir, "KanjiDatabase.sqlite")
+
+    for path in [path_to_srs_db, path_to_full_db]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    n_kanji = min(max(size // 10, 10), 50000)
+
+    create_full_db(path_to_full_db, size, n_kanji, seed)
+    create_srs_db(path_to_srs_db, int(size * 0.8) + n_kanji // 2, n_kanji // 2, seed)
+
+    return path_to_srs_db, path_to_full_db
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type = int, default = 1000, help = "Vocab rows in the dictionary (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--out", default = "bench/data", help = "Directory for srs.db and KanjiDatabase.sqlite")
+    parser.add_argument("--seed", type = int, default = 0)
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path_to_srs_db, path_to_full_db = generate(args.out, args.size, args.seed)
+
+    print(f"Generated {path_to_srs_db} and {path_to_full_db} in {time.perf_counter() - start:.1f}s")
+
+if __name__ in {"__main__"}:
+    main()
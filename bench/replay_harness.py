@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tomllib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.generate_deck import generate
+from src.srs_app import SrsApp
+from src.discord_bot import Bot
+from src.dataclasses import BotConfig, SrsConfig, Colors
+
+# replays review conversations through Bot's real handlers, offline
+# the discord side (guild, channel, user, message, slash context) is a small stand-in that records what the bot sends,
+# the deck is a local synthetic sqlite db, no token and no network
+#
+# every learner gets their own session, turns are interleaved round robin
+# wrong answers are followed by "ok", "add" or "re" like a real user would
+# usage: python bench/replay_harness.py --users 20 --answers 200 --accuracy 0.8
+
+
+class FakeObject:
+    def __init__(self, id: int, name: str = None, bot: bool = False):
+        self.id = id
+        self.name = name or str(id)
+        self.bot = bot
+
+    def __str__(self):
+        return self.name
+
+class FakeChannel(FakeObject):
+    def __init__(self, id: int):
+        super().__init__(id)
+        self.sends = 0
+        self.embeds = 0
+
+    async def send(self, content = None, *, embed = None, embeds = None, **kwargs):
+        self.sends += 1
+        self.embeds += (embed is not None) + len(embeds or [])
+
+        return None
+
+class FakeMessage:
+    def __init__(self, guild: FakeObject, channel: FakeChannel, author: FakeObject, content: str):
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self._state = None
+
+class FakeContext:
+    def __init__(self, guild: FakeObject, channel: FakeChannel, author: FakeObject):
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.guild_id = guild.id if guild else None
+        self.channel_id = channel.id
+
+    async def respond(self, content = None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def send(self, content = None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def defer(self, **kwargs):
+        return None
+
+def slash_command(bot: Bot, name: str):
+    for command in bot.bot.pending_application_commands:
+        if command.name == name:
+            return command.callback
+
+    raise KeyError(name)
+
+def percentile(timings: list[float], q: float) -> float:
+    return timings[min(int(len(timings) * q), len(timings) - 1)]
+
+# what a learner types for the current card
+def answer_for(session, rng: random.Random, accuracy: float) -> str:
+    card = session.current_card
+
+    if rng.random() >= accuracy:
+        return "zzz"
+
+    match card.card_type:
+        case "reading":
+            return card.readings.split(",")[0].strip()
+
+        case "meaning":
+            return card.meanings.split(",")[0].strip()
+
+async def replay(bot: Bot, n_users: int, n_answers: int, accuracy: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    srs_app = bot.srs_app
+    guild = FakeObject(1, "guild")
+    learners = [(FakeChannel(100 + i), FakeObject(1000 + i, f"learner{i}")) for i in range(n_users)]
+
+    # on_message ignores the bot's own messages, so it needs a logged in user
+    bot.bot._connection.user = FakeObject(1, "bot", bot = True)
+
+    start_timings = []
+
+    for channel, user in learners:
+        start = time.perf_counter()
+        await slash_command(bot, "start")(FakeContext(guild, channel, user))
+        start_timings.append(time.perf_counter() - start)
+
+    timings = []
+    sends_per_answer = []
+    active = list(learners)
+
+    while active and len(timings) < n_answers:
+        for channel, user in list(active):
+            session = srs_app.sessions.get(bot._session_key(guild, channel, user))
+
+            if session is None:
+                active.remove((channel, user))
+
+                continue
+
+            if session.showing_wrong_message:
+                content = rng.choice(["ok", "ok", "ok", "add", "re"])
+
+            else:
+                content = answer_for(session, rng, accuracy)
+
+            sends_before = channel.sends
+
+            start = time.perf_counter()
+            await bot.bot.on_message(FakeMessage(guild, channel, user, content))
+            timings.append(time.perf_counter() - start)
+
+            sends_per_answer.append(channel.sends - sends_before)
+
+    await bot.async_srs_app.force_commit()
+
+    timings.sort()
+    start_timings.sort()
+
+    return {
+        "messages": len(timings),
+        "p50_ms": percentile(timings, 0.5) * 1e3,
+        "p95_ms": percentile(timings, 0.95) * 1e3,
+        "p99_ms": percentile(timings, 0.99) * 1e3,
+        "start_p50_ms": percentile(start_timings, 0.5) * 1e3,
+        "sends_per_answer": sum(sends_per_answer) / len(sends_per_answer) if sends_per_answer else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type = int, default = 10000, help = "Synthetic deck size")
+    parser.add_argument("--users", type = int, default = 10, help = "Learners reviewing at the same time")
+    parser.add_argument("--answers", type = int, default = 500, help = "Messages to replay in total")
+    parser.add_argument("--accuracy", type = float, default = 0.8, help = "Chance that an answer is correct")
+    parser.add_argument("--seed", type = int, default = 0)
+
+    args = parser.parse_args()
+
+    with open("config.toml", "rb") as f:
+        config = tomllib.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path_to_srs_db, path_to_full_db = generate(tmp, args.size, args.seed)
+
+        config_srs = SrsConfig(
+            srs_interval = config["srs_interval"],
+            path_to_srs_db = path_to_srs_db,
+            path_to_full_db = path_to_full_db,
+            max_reviews_at_once = config["max_reviews_at_once"],
+            entries_before_commit = config["entries_before_commit"],
+            max_commit_latency = config["max_commit_latency"],
+            match_score_threshold = config["match_score_threshold"]
+        )
+
+        srs_app = SrsApp(config_srs)
+        srs_app.init_db()
+
+        config_bot = BotConfig(
+            srs_app = srs_app,
+            token = None,
+            prefix = config["discord"]["command_prefix"],
+        )
+
+        bot = Bot(config_bot, Colors())
+
+        async def run() -> dict:
+            results = await replay(bot, args.users, args.answers, args.accuracy, args.seed)
+            await bot.async_srs_app.close()
+
+            return results
+
+        results = asyncio.run(run())
+
+    print(f"messages: {results['messages']} from {args.users} learners")
+    print(f"on_message latency: p50 {results['p50_ms']:.3f} ms, p95 {results['p95_ms']:.3f} ms, p99 {results['p99_ms']:.3f} ms")
+    print(f"/start latency: p50 {results['start_p50_ms']:.3f} ms")
+    print(f"sends per answer: {results['sends_per_answer']:.2f}")
+
+if __name__ in {"__main__"}:
+    main()
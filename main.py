@@ -1,34 +1,114 @@
+import time
+
+# taken before anything else is imported, for --profile-startup
+start_time = time.perf_counter()
+
 import tomllib
 import os
 import signal
 import asyncio
-import types
 import argparse
 
 from src.srs_app import SrsApp
 from src.discord_bot import Bot
 from src.dataclasses import BotConfig, SrsConfig, Colors
 
+imported_time = time.perf_counter()
+
+# --profile-startup: how long each phase took and when it was done (since the first import)
+# init_db runs on the db thread while the bot connects, so those two overlap
+class StartupProfile:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.phases = [("import", start_time, imported_time)]
+
+    def add(self, name: str, phase_start: float) -> None:
+        self.phases.append((name, phase_start, time.perf_counter()))
+
+        return None
+
+    def report(self) -> None:
+        if not self.enabled:
+            return None
+
+        print(f"{'phase':<16}{'took':>10}{'done at':>10}")
+
+        for name, phase_start, phase_end in self.phases:
+            print(f"{name:<16}{phase_end - phase_start:>9.3f}s{phase_end - start_time:>9.3f}s")
+
+        return None
+
+# python main.py migrate: convert houhou's srs.db outside the bot, in chunks
+# safe to interrupt, running it again resumes after the last chunk
+def migrate(srs_app: SrsApp, chunk_size: int, dry_run: bool) -> None:
+    srs_app.init_db(load_caches = False)
+
+    def report_progress(done: int, total: int) -> None:
+        print(f"\rConverted {done}/{total} rows ({done / max(total, 1):.0%})", end = "", flush = True)
+
+        return None
+
+    try:
+        summary = srs_app.convert_from_houhou(chunk_size = chunk_size, dry_run = dry_run, progress = report_progress)
+
+    finally:
+        srs_app.close_db()
+
+    if summary["new_columns"]:
+        print(f"Columns to add: {', '.join(summary['new_columns'])}")
+
+    if summary["resumed_after"]:
+        print(f"Resuming after rowid {summary['resumed_after']}.")
+
+    if dry_run:
+        print(f"{summary['rows']} rows in {summary['chunks']} chunks of {chunk_size}, estimated {summary['seconds']:.1f}s.")
+
+    elif summary["rows"]:
+        print(f"\nDone in {summary['seconds']:.1f}s.")
+
+    else:
+        print("Nothing to convert.")
+
+    return None
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--debug", action = "store_true", help = "Enable debug mode")
+    parser.add_argument("--dictionary-in-memory", action = "store_true", help = "Copy the dictionary database into memory at startup")
+    parser.add_argument("--profile-startup", action = "store_true", help = "Print how long each startup phase took")
+
+    subparsers = parser.add_subparsers(dest = "command")
+    parser_migrate = subparsers.add_parser("migrate", help = "Convert a Houhou srs.db for the bot, without running the bot")
+    parser_migrate.add_argument("--chunk-size", type = int, default = 5000, help = "Rows converted per transaction")
+    parser_migrate.add_argument("--dry-run", action = "store_true", help = "Only count the rows and estimate how long it would take")
 
     args = parser.parse_args()
 
+    profile = StartupProfile(args.profile_startup)
+    config_start = time.perf_counter()
+
     with open("config.toml", "rb") as f:
         config = tomllib.load(f)
 
+    # keys added after the first release fall back to their defaults, so an older config.toml still loads
     config_srs = SrsConfig(
         srs_interval = config["srs_interval"],
         path_to_srs_db = config["path_to_srs_db"],
         path_to_full_db = config["path_to_full_db"],
         max_reviews_at_once = config["max_reviews_at_once"],
         entries_before_commit = config["entries_before_commit"],
-        match_score_threshold = config["match_score_threshold"]
+        max_commit_latency = config.get("max_commit_latency", SrsConfig.max_commit_latency),
+        match_score_threshold = config["match_score_threshold"],
+        dictionary_readers = config.get("dictionary_readers", SrsConfig.dictionary_readers),
+        dictionary_mmap_size = config.get("dictionary_mmap_mb", SrsConfig.dictionary_mmap_size // (1024 * 1024)) * 1024 * 1024,
+        dictionary_in_memory = args.dictionary_in_memory,
+        path_to_lookup_db = config.get("path_to_lookup_db") or SrsConfig.path_to_lookup_db
     )
 
     srs_app = SrsApp(config_srs)
-    srs_app.init_db()
+
+    if args.command == "migrate":
+        return migrate(srs_app, args.chunk_size, args.dry_run)
 
     token_env = config["discord"]["token_env"]
     token = os.getenv(token_env)
@@ -42,31 +122,89 @@ def main():
         srs_app = srs_app,
         token = token,
         prefix = config["discord"]["command_prefix"],
-        debug = args.debug
+        debug = args.debug,
+        metrics_file = config.get("path_to_metrics_file") or BotConfig.metrics_file
     )
 
     colors = Colors()
     bot = Bot(config_bot, colors)
 
-    # helper to shutdown
-    async def shutdown() -> None:
-        srs_app.close_db()
+    profile.add("config", config_start)
+
+    # the databases open on the db thread while the bot logs in and connects
+    init_db_start = time.perf_counter()
+    bot.async_srs_app.start_init_db()
+    bot.async_srs_app.init_future.add_done_callback(lambda _: profile.add("init_db", init_db_start))
+
+    gateway_start = None
+
+    async def report_startup() -> None:
+        nonlocal gateway_start
+
+        # on_ready fires again on reconnects
+        if gateway_start is None:
+            return None
+
+        profile.add("gateway ready", gateway_start)
+        gateway_start = None
+
+        # report once init_db is done too (the bot reports it if it failed)
+        try:
+            await bot.async_srs_app.wait_for_init_db()
 
-        await bot.bot.close()
+        except Exception:
+            return None
+
+        profile.report()
 
         return None
 
+    if args.profile_startup:
+        bot.bot.add_listener(report_startup, "on_ready")
+
     # handle sigint/sigterm
-    def signal_handler(signal: int, frame: types.FrameType) -> None:
+    # closing the bot makes bot.bot.start return, the final flush then runs in run_bot's finally
+    def signal_handler() -> None:
         print("\nShutting down!")
-        asyncio.create_task(shutdown())
+        asyncio.create_task(bot.bot.close())
 
         return None
 
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    # the bot is driven here rather than by bot.bot.run, which would install its own signal handlers
+    # and return without ever closing the db
+    async def run_bot() -> None:
+        nonlocal gateway_start
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGINT, signal_handler)
+        loop.add_signal_handler(signal.SIGTERM, signal_handler)
+
+        gateway_start = time.perf_counter()
+
+        try:
+            await bot.start()
+
+        finally:
+            if not bot.bot.is_closed():
+                await bot.bot.close()
+
+            # close on the db thread so an in-flight query finishes first
+            # the final flush gets a deadline, so a stuck disk can't hang shutdown
+            # past it, the db thread is still stuck in close_db and exiting normally would join it, so exit right away
+            if not await bot.async_srs_app.close(deadline = 10):
+                print("Exiting without waiting for the db thread.", flush = True)
+                os._exit(1)
+
+        return None
+
+    # py-cord binds the client to the loop it was created on
+    loop = bot.bot.loop
+
+    try:
+        loop.run_until_complete(run_bot())
 
-    bot.start()
+    finally:
+        loop.close()
 
 if __name__ in {"__main__"}:
     main()
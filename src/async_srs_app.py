@@ -0,0 +1,152 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING
+
+from src.srs_app import SrsApp
+from src.review_session import ReviewSession
+
+if TYPE_CHECKING:
+    from pandas.core.frame import DataFrame
+
+
+# async facade over SrsApp
+# every call that touches sqlite runs on a dedicated executor so the discord gateway loop never blocks on disk
+# the app shares one connection (and one transaction buffer), so by default there is a single db thread
+# which also serializes all writes
+# dictionary scans use the app's read-only reader pool instead, on their own threads, so they never queue behind writes
+class AsyncSrsApp:
+    def __init__(self, srs_app: SrsApp, max_workers: int = 1):
+        self.srs_app = srs_app
+        self.executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = "srs_db")
+        self.reader_executor = ThreadPoolExecutor(max_workers = srs_app.dictionary_readers, thread_name_prefix = "srs_reader")
+        self.flusher = None
+        self.init_future = None
+
+    # run any blocking callable on the db executor
+    async def run(self, f, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, partial(f, *args, **kwargs))
+
+    # same, but on the reader threads
+    async def run_reader(self, f, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.reader_executor, partial(f, *args, **kwargs))
+
+    # open the db on the db thread while the bot connects to discord
+    # the executor is first in first out, so every later call waits for this one
+    def start_init_db(self) -> None:
+        self.init_future = self.executor.submit(self.srs_app.init_db)
+
+        return None
+
+    # raises whatever init_db raised
+    async def wait_for_init_db(self) -> None:
+        if self.init_future is not None:
+            await asyncio.wrap_future(self.init_future)
+
+        return None
+
+    async def start_review_session(self, session: ReviewSession) -> list:
+        return await self.run(self.srs_app.start_review_session, session)
+
+    async def update_review_session(self, session: ReviewSession) -> None:
+        return await self.run(self.srs_app.update_review_session, session)
+
+    async def update_review_item(self, session: ReviewSession, item_id: str, res: bool) -> dict:
+        return await self.run(self.srs_app.update_review_item, session, item_id, res)
+
+    # the write happens on the db thread, the cards waiting in sessions are refreshed back here on the loop
+    async def add_valid_response(self, user_input: str, item: dict) -> None:
+        res = await self.run(self.srs_app.add_valid_response, user_input, item)
+
+        if res is not None:
+            response_col, valid_responses = res
+            self.srs_app.refresh_valid_responses(item["ID"], response_col, valid_responses)
+
+        return None
+
+    async def add_review_item(self, item: dict) -> None:
+        return await self.run(self.srs_app.add_review_item, item)
+
+    async def add_review_items_bulk(self, *args, **kwargs) -> dict:
+        return await self.run(self.srs_app.add_review_items_bulk, *args, **kwargs)
+
+    async def edit_review_item(self, item: dict) -> None:
+        return await self.run(self.srs_app.edit_review_item, item)
+
+    async def find_confused_meaning(self, answer: str, item_id: int) -> tuple:
+        return await self.run(self.srs_app.find_confused_meaning, answer, item_id)
+
+    async def get_review_stats(self) -> tuple["DataFrame", "DataFrame", "DataFrame"]:
+        return await self.run(self.srs_app.get_review_stats)
+
+    async def get_stats(self) -> dict:
+        return await self.run(self.srs_app.get_stats)
+
+    async def check_stats_cache(self) -> bool:
+        return await self.run(self.srs_app.check_stats_cache)
+
+    async def get_due_reviews(self) -> list[dict]:
+        return await self.run(self.srs_app.get_due_reviews)
+
+    async def discover_vocab_page(self, *args, **kwargs) -> tuple[list[dict], int]:
+        return await self.run_reader(self.srs_app.discover_vocab_page, *args, **kwargs)
+
+    async def discover_kanji_page(self, *args, **kwargs) -> tuple[list[dict], int]:
+        return await self.run_reader(self.srs_app.discover_kanji_page, *args, **kwargs)
+
+    async def lookup(self, query: str, limit: int = 10) -> list[dict]:
+        return await self.run_reader(self.srs_app.lookup, query, limit)
+
+    async def restore_sessions(self) -> list[ReviewSession]:
+        return await self.run(self.srs_app.restore_sessions)
+
+    async def force_commit(self) -> None:
+        return await self.run(self.srs_app.force_commit)
+
+    # group commit: writes are committed once enough pile up (see SrsApp.to_commit)
+    # or once the oldest one has waited max_commit_latency seconds, whichever comes first
+    async def run_flusher(self) -> None:
+        tick = min(1.0, self.srs_app.max_commit_latency / 4)
+
+        while True:
+            await asyncio.sleep(tick)
+
+            if self.srs_app.commit_overdue():
+                try:
+                    await self.run(self.srs_app.force_commit)
+
+                # keep flushing, the next tick retries
+                except Exception as e:
+                    print(f"Background commit failed: {e}")
+
+    # needs a running loop, safe to call again (e.g. on every reconnect)
+    def start_flusher(self) -> None:
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.create_task(self.run_flusher())
+
+        return None
+
+    # final flush, close the connection on the db thread, then stop the executor
+    # returns False if the deadline passed first, the db thread is then still busy with close_db
+    async def close(self, deadline: float = None) -> bool:
+        if self.flusher is not None:
+            self.flusher.cancel()
+
+        closed = True
+
+        try:
+            await asyncio.wait_for(self.run(self.srs_app.close_db), timeout = deadline)
+
+        except asyncio.TimeoutError:
+            print(f"Final commit did not finish within {deadline}s.")
+            closed = False
+
+        self.executor.shutdown(wait = False)
+        self.reader_executor.shutdown(wait = False)
+
+        return closed
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from enum import Enum, auto
 from typing import Optional, Dict, Literal, List, Tuple
 
 
@@ -9,6 +10,7 @@ class BotConfig:
     token: Optional[str] = None
     prefix: Optional[str] = None
     debug: bool = False
+    metrics_file: Optional[str] = None
 
 # definition for an interval in config.toml
 @dataclass
@@ -24,7 +26,12 @@ class SrsConfig:
     path_to_full_db: str
     max_reviews_at_once: int = 10
     entries_before_commit: int = 10
+    max_commit_latency: float = 5.0
     match_score_threshold: int = 85
+    dictionary_readers: int = 2
+    dictionary_mmap_size: int = 256 * 1024 * 1024
+    dictionary_in_memory: bool = False
+    path_to_lookup_db: Optional[str] = None
 
 # colors
 @dataclass
@@ -41,12 +48,19 @@ class Colors:
         if self.progress is None:
             self.progress = [(207, 250, 209), (159, 246, 163), (111, 241, 118), (63, 237, 72), (15, 232, 26)]
 
-# card type
-class Card:
-    review_type: Optional[str] = None
-    card_type: Optional[str] = None
-    item_id: Optional[int] = None
-    readings: Optional[List[str]] = None
-    meanings: Optional[List[str]] = None
-    kanji: Optional[str] = None
-    vocab: Optional[str] = None
+# state of a review session
+class AppState(Enum):
+    RUNNING = auto()
+    WILL_STOP = auto()
+    STOPPED = auto()
+
+# (guild id, channel id, user id)
+# guild id is None for dms
+SessionKey = Tuple[Optional[int], int, int]
+
+# parts queued for one learner in a channel by the outbox, sent together on flush
+@dataclass
+class PendingMessage:
+    target: object
+    contents: List[str] = field(default_factory = list)
+    embeds: List[object] = field(default_factory = list)
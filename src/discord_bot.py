@@ -1,40 +1,19 @@
 import os
+import asyncio
 import discord
-import re
 import random
-import pandas as pd
 
-from enum import Enum, auto
 from discord.ext import commands
 from typing import Optional
-from pyokaka import okaka
-from rapidfuzz import process, fuzz
 
-from src.dataclasses import BotConfig, Colors, Card
+from src.async_srs_app import AsyncSrsApp
+from src.dataclasses import BotConfig, Colors, AppState, SessionKey
+from src.review_session import ReviewSession
+from src.kana import romaji_to_kana
+from src.metrics import metrics
+from src.outbox import Outbox, MAX_EMBED_LENGTH
 
 
-def romaji_to_kana(string):
-    processed_string = ""
-    prev = ""
-
-    for char in string.lower():
-        if char + prev == "nn":
-            prev = ""
-            processed_string += "n'"
-
-        else:
-            prev = char
-            processed_string += char
-
-    kana = okaka.convert(processed_string)
-
-    return kana
-
-class AppState(Enum):
-    RUNNING = auto()
-    WILL_STOP = auto()
-    STOPPED = auto()
-
 class Bot:
     def __init__(self, config: BotConfig, colors: Colors):
         intents = discord.Intents.default()
@@ -48,18 +27,22 @@ class Bot:
         )
 
         self.srs_app = config.srs_app
+        self.async_srs_app = AsyncSrsApp(self.srs_app)
         self.debug_mode = config.debug
+        self.metrics_file = config.metrics_file
+        self.metrics_task = None
+        self.sessions_restored = False
+        self.outbox = Outbox(self._send)
+
+        # items per /discover page, one embed field each (an embed holds at most 25)
+        self.discover_page_size = 10
+
+        # a field value can be 1024 characters, but ten of those don't fit in one embed
+        self.max_field_length = 450
 
         # init defs
         self.token = config.token
         self.colors = colors
-        self.current_card = Card()
-
-        self.review_channel = None
-        self.item_dict = None
-        self.showing_wrong_message = False
-        self.previous_answer = None
-        self.state = AppState.STOPPED
 
         # thanks claude
         self.encouraging_messages = [
@@ -88,11 +71,14 @@ class Bot:
         self.setup_events()
         self.setup_commands()
 
-    def _start_review(self) -> bool:
-        reviews = self.srs_app.start_review_session()
+    # sessions are per (guild, channel, user), so many learners can review at once
+    def _session_key(self, guild, channel, author) -> SessionKey:
+        guild_id = guild.id if guild else None
+
+        return (guild_id, channel.id, author.id)
 
-        # initialize empty vars
-        self.item_dict = dict()
+    async def _start_review(self, session: ReviewSession) -> bool:
+        reviews = await self.async_srs_app.start_review_session(session)
 
         if reviews:
             return True
@@ -100,53 +86,121 @@ class Bot:
         else:
             return False
 
-    def _clean_buffer(self) -> None:
-        self.showing_wrong_message = False
-        self.previous_answer = None
+    def _clean_buffer(self, session: ReviewSession) -> None:
+        session.showing_wrong_message = False
+        session.previous_answer = None
 
         return None
 
-    def start(self) -> None:
-        self.bot.run(self.token)
+    # both cards of an item are done once it has two correct answers
+    async def _complete_item(self, session: ReviewSession, correct: bool) -> None:
+        item_id = session.current_card.item_id
+
+        # counters per item are (correct answers, submitted answers)
+        # if a = 2, then the user has completed both reviews
+        # if it also took exactly 2 tries, both were right the first time and the item goes up a grade
+        is_done, is_first_try = session.record_attempt(item_id, correct)
+
+        if is_done:
+            await self.async_srs_app.update_review_item(session, item_id, is_first_try)
+            await self.async_srs_app.update_review_session(session)
 
         return None
 
-    def update_embed(self):
-        previous_text = self.current_card.kanji or self.current_card.vocab
-        current_item = self.srs_app.get_current_item()
+    # a session restored after a restart picks up at its current card
+    # a pending wrong answer was never graded, so the card is just asked again (same as "re")
+    async def _resume_review(self, session: ReviewSession) -> None:
+        _, channel_id, user_id = session.key
+        channel = self.bot.get_channel(channel_id)
+
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(channel_id)
+
+            except discord.DiscordException:
+                self.srs_app.end_review_session(session.key)
+
+                return None
+
+        async with session.lock:
+            session.channel = channel
+            embed = await self.update_embed(session)
+            self.srs_app.save_session(session)
+
+            self.outbox.queue(channel, user_id, "I'm back! Picking up your review where you left off.")
+            self.outbox.queue(channel, user_id, embed = embed)
+            await self.outbox.flush(channel, user_id)
+
+        return None
+
+    # returns once the bot is closed
+    async def start(self) -> None:
+        await self.bot.start(self.token)
+
+        return None
+
+    # dictionary items as embed fields, cut to fit
+    # returns False (and adds nothing) once the embed is full
+    def _add_item_field(self, embed: discord.Embed, name: str, value: str) -> bool:
+        name = (name or "-")[:256]
+        value = value or "-"
+
+        if len(value) > self.max_field_length:
+            value = value[:self.max_field_length - 1] + "…"
+
+        if len(embed) + len(name) + len(value) > MAX_EMBED_LENGTH:
+            return False
+
+        embed.add_field(name = name, value = value, inline = False)
+
+        return True
+
+    # every outbound message goes through here, so sends show up in the metrics
+    async def _send(self, target, *args, **kwargs):
+        with metrics.span("discord.send"):
+            return await target.send(*args, **kwargs)
+
+    # dump the histograms for prometheus' textfile collector every so often
+    async def _write_metrics(self, interval: float = 15) -> None:
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                metrics.write_prometheus(self.metrics_file)
+
+            except OSError as e:
+                print(f"Unable to write metrics to {self.metrics_file}: {e}")
+
+    @metrics.timed("embed.update")
+    async def update_embed(self, session: ReviewSession):
+        current_card = self.srs_app.get_current_item(session)
+        session.current_card = current_card
 
-        if current_item is None:
+        if current_card is None:
 
             # set everything back to default
-            self.state = AppState.STOPPED
-            self.review_channel = None
-            self.srs_app.force_commit()
+            session.state = AppState.STOPPED
+            self.srs_app.end_review_session(session.key)
+            await self.async_srs_app.force_commit()
+            await self.async_srs_app.check_stats_cache()
 
             return discord.Embed(title = "No more reviews!")
 
-        self.current_card.review_type = current_item["review_type"]
-        self.current_card.card_type = current_item["card_type"]
-        self.current_card.item_id = current_item["ID"]
-        self.current_card.readings = current_item["Readings"]
-        self.current_card.meanings = current_item["Meanings"]
-        self.current_card.kanji = current_item["AssociatedKanji"]
-        self.current_card.vocab = current_item["AssociatedVocab"]
-
         review_color = None
         separator = None
         display_text = None
 
         # style the cards differently based on what the item is
-        match self.current_card.review_type:
+        match current_card.review_type:
             case "kanji":
-                display_text = self.current_card.kanji
+                display_text = current_card.kanji
                 review_color = self.colors.kanji
 
             case "vocab":
-                display_text = self.current_card.vocab
+                display_text = current_card.vocab
                 review_color = self.colors.vocab
 
-        match self.current_card.card_type:
+        match current_card.card_type:
             case "reading":
                 separator = ":black_large_square:" * 10
 
@@ -158,22 +212,27 @@ class Bot:
             description = separator,
             color = discord.Color.from_rgb(review_color[0], review_color[1], review_color[2])
         )
-        embed.set_footer(text = f"{self.srs_app.current_completed} / {self.srs_app.len_review_ids}")
+        embed.set_footer(text = f"{session.current_completed} / {session.len_review_ids}")
 
         return embed
 
-    def wrong_embed(self, content, correct_readings):
-        match self.current_card.review_type:
+    @metrics.timed("embed.wrong")
+    def wrong_embed(self, session: ReviewSession, content, correct_readings, confused_with = None):
+        current_card = session.current_card
+
+        match current_card.review_type:
             case "kanji":
-                display_text = self.current_card.kanji
+                display_text = current_card.kanji
 
             case "vocab":
-                display_text = self.current_card.vocab
+                display_text = current_card.vocab
 
-        match self.current_card.card_type:
+        match current_card.card_type:
             case "reading":
                 separator = ":black_large_square:" * 10
-                user_response = romaji_to_kana(content)
+
+                with metrics.span("answer.transliterate"):
+                    user_response = romaji_to_kana(content)
 
             case "meaning":
                 separator = ":white_large_square:" * 10
@@ -185,7 +244,7 @@ class Bot:
             color = discord.Color.brand_red()
         )
 
-        embed.set_footer(text = f"{self.srs_app.current_completed} / {self.srs_app.len_review_ids}")
+        embed.set_footer(text = f"{session.current_completed} / {session.len_review_ids}")
 
         embed.add_field(
             name = "Correct readings:",
@@ -199,30 +258,33 @@ class Bot:
             inline = False
         )
 
+        # the answer is (close to) the meaning of another item in the deck
+        if confused_with:
+            prompt, meaning, _ = confused_with
+
+            embed.add_field(
+                name = "That's the meaning of:",
+                value = f"{prompt} ({meaning})",
+                inline = False
+            )
+
         return embed
 
     # function to process an answer and calls the app to save the information
-    def process_answer(self, answer, will_submit):
+    async def process_answer(self, session: ReviewSession, answer, will_submit):
+        current_card = session.current_card
         answer_stripped = answer.strip()
         answer_lower = answer_stripped.lower()
         answer_kana = None
-        lookup_readings = dict()
-
-        # keep track of progress for all items using a dictionary
-        if self.current_card.item_id not in self.item_dict:
-            self.item_dict[self.current_card.item_id] = []
+        lookup_readings = current_card.answer_index
 
         # retrieve all valid readings and compare the typed answer to the valid readings
-        match self.current_card.card_type:
+        match current_card.card_type:
 
             # reading cards should be strict, since a mistype of kana usually means a different word
             case "reading":
-                valid_readings = self.current_card.readings.split(",")
-                answer_kana = romaji_to_kana(answer_lower)
-
-                for reading in valid_readings:
-                    reading_stripped = reading.strip()
-                    lookup_readings[reading_stripped] = reading
+                with metrics.span("answer.transliterate"):
+                    answer_kana = romaji_to_kana(answer_lower)
 
                 if answer_kana in lookup_readings:
                     matching_score = 100
@@ -230,61 +292,65 @@ class Bot:
                 else:
                     matching_score = 0
 
-            # use fuzzy matching to score meanings
+            # use fuzzy matching to score meanings, unless it is an exact hit
             case "meaning":
-                valid_readings = self.current_card.meanings.split(",")
-
-                for reading in valid_readings:
-                    reading_stripped = reading.strip()
-                    reading_lower = reading_stripped.lower()
-                    remove_all_in_parentheses = re.sub(r"\s*\([^)]*\)\s*", "", reading_lower)
-                    strip_parentheses = re.sub(r"[()]", "", reading_lower)
+                with metrics.span("answer.match"):
+                    if answer_lower in lookup_readings:
+                        matching_score = 100
 
-                    lookup_readings[strip_parentheses] = reading
-                    lookup_readings[remove_all_in_parentheses] = reading
+                    # only needed for near misses, so it is loaded on first use
+                    else:
+                        from rapidfuzz import process, fuzz
 
-                _, matching_score, _ = process.extractOne(answer_lower, lookup_readings.keys(), scorer = fuzz.QRatio)
+                        _, matching_score, _ = process.extractOne(answer_lower, lookup_readings.keys(), scorer = fuzz.QRatio)
 
-        valid_readings_str = str(valid_readings)
-        self.previous_answer = answer_kana if answer_kana else answer_lower
+        valid_readings_str = str(current_card.valid_answers)
+        session.previous_answer = answer_kana if answer_kana else answer_lower
 
         # if the score is over a certain threshold, then we mark it as correct
         # otherwise, it's incorrect
-        current_review = self.srs_app.current_reviews.pop(self.srs_app.current_index)
-
-        to_append = 0
-        if matching_score > self.srs_app.match_score_threshold:
-            to_append = 1
+        is_correct = matching_score > self.srs_app.match_score_threshold
 
-        else:
-            self.srs_app.current_reviews.append(current_review)
-
-        if to_append == 1 or will_submit:
-            self.item_dict[self.current_card.item_id].append(to_append)
-
-            # my way of marking if both the reading and meaning cards are marked as correct
-            # if so, then we should update the review item
-            # if the user gets both correct on the first try, the list would look like [1, 1]
-            # if they can't something wrong: [..., 1, ..., 1], where ... may be any length of 0s
-            # a faster solution is storing a tuple (a, b)
-            # if a = 2, then the user has completed both reviews
-            # b is a counter for how many tries the user has taken
-            if sum(self.item_dict[self.current_card.item_id]) == 2:
-                if len(self.item_dict[self.current_card.item_id]) == 2:
-                    self.srs_app.update_review_item(self.current_card.item_id, True)
+        # a fresh answer takes the card off the front, a wrong one puts it at the back to be asked again
+        # a submitted one ("ok") is for a card that was already put back
+        if not will_submit:
+            session.pop_front(requeue = not is_correct)
 
-                else:
-                    self.srs_app.update_review_item(self.current_card.item_id, False)
+        elif is_correct:
+            session.remove(current_card)
 
-                del self.item_dict[self.current_card.item_id]
-                self.srs_app.update_review_session()
+        if is_correct or will_submit:
+            await self._complete_item(session, is_correct)
 
-        return (bool(to_append), valid_readings_str)
+        return (is_correct, valid_readings_str)
 
     def setup_events(self):
 
         @self.bot.event
         async def on_ready() -> None:
+
+            # the db may still be opening, see AsyncSrsApp.start_init_db
+            try:
+                await self.async_srs_app.wait_for_init_db()
+
+            except Exception as e:
+                print(f"Unable to open the databases: {e}")
+                await self.bot.close()
+
+                return None
+
+            self.async_srs_app.start_flusher()
+
+            if self.metrics_file and self.metrics_task is None:
+                self.metrics_task = asyncio.create_task(self._write_metrics())
+
+            # on_ready also fires on reconnects, sessions only need restoring once
+            if not self.sessions_restored:
+                self.sessions_restored = True
+
+                for session in await self.async_srs_app.restore_sessions():
+                    await self._resume_review(session)
+
             if self.debug_mode:
                 print(f"{self.bot.user} is connected.")
 
@@ -299,89 +365,97 @@ class Bot:
             if author == self.bot.user:
                 return None
 
-            # if review is active in this channel, print res
-            if self.state in [AppState.RUNNING, AppState.WILL_STOP] and message.channel == self.review_channel:
-                embed = None
-
-                # term msgs
-                if self.debug_mode:
-                    print(f"[{author}]: {content}")
-
-                if self.showing_wrong_message:
-                    match content:
-                        case "ok":
-                            await message.channel.send(random.choice(self.encouraging_messages))
-                            _, correct_readings = self.process_answer(self.previous_answer, True)
-                            embed = self.update_embed()
-                            self._clean_buffer()
-
-                        case "add":
-                            await message.channel.send(f"Added {self.previous_answer} as a valid response.")
-
-                            current_item = {
-                                "card_type": self.current_card.card_type,
-                                "ID": self.current_card.item_id,
-                                "Readings": self.current_card.readings,
-                                "Meanings": self.current_card.meanings
-                            }
-
-                            # same as srsly i guess...
-                            self.srs_app.add_valid_response(self.previous_answer, current_item)
-                            self.srs_app.current_reviews.pop()
-                            
-                            self.item_dict[self.current_card.item_id].append(1)
-
-                            # please for the love of god make this more optimized
-                            if sum(self.item_dict[self.current_card.item_id]) == 2:
-                                if len(self.item_dict[self.current_card.item_id]) == 2:
-                                    self.srs_app.update_review_item(self.current_card.item_id, True)
-                                else:
-                                    self.srs_app.update_review_item(self.current_card.item_id, False)
-                                
-                                del self.item_dict[self.current_card.item_id]
-                                self.srs_app.update_review_session()
-
-                            embed = self.update_embed()
-                            self._clean_buffer()
-
-                        case "re":
-                            await message.channel.send("redo")
-                            embed = self.update_embed()
-                            self._clean_buffer()
-
-                        case _:
-                            await message.channel.send("Please type either 'ok', 'add', or 're'.")
-
-                    if embed:
-                        await message.channel.send(embed = embed)
+            # if this user has a review active in this channel, print res
+            key = self._session_key(message.guild, message.channel, author)
+            session = self.srs_app.sessions.get(key)
 
-                    return None
+            if session is not None:
 
-                # don't process any commands
-                elif content.startswith(self.command_prefix):
-                    await self.bot.process_commands(message)
+                # db calls are awaited, so another message from this user could slip in mid-answer
+                async with session.lock, metrics.span("message.total"):
+                    if session.state in [AppState.RUNNING, AppState.WILL_STOP]:
+                        embed = None
 
-                    return None
+                        # term msgs
+                        if self.debug_mode:
+                            print(f"[{author}]: {content}")
 
-                # "otherwise"
-                else:
+                        if session.showing_wrong_message:
+                            match content:
+                                case "ok":
+                                    self.outbox.queue(message.channel, author.id, random.choice(self.encouraging_messages))
+                                    _, correct_readings = await self.process_answer(session, session.previous_answer, True)
+                                    embed = await self.update_embed(session)
+                                    self._clean_buffer(session)
+
+                                case "add":
+                                    self.outbox.queue(message.channel, author.id, f"Added {session.previous_answer} as a valid response.")
+
+                                    current_card = session.current_card
+                                    current_item = {
+                                        "card_type": current_card.card_type,
+                                        "ID": current_card.item_id,
+                                        "Readings": current_card.readings,
+                                        "Meanings": current_card.meanings
+                                    }
+
+                                    # same as srsly i guess...
+                                    await self.async_srs_app.add_valid_response(session.previous_answer, current_item)
+                                    session.remove(current_card)
+
+                                    await self._complete_item(session, True)
+
+                                    embed = await self.update_embed(session)
+                                    self._clean_buffer(session)
+
+                                case "re":
+                                    self.outbox.queue(message.channel, author.id, "redo")
+                                    embed = await self.update_embed(session)
+                                    self._clean_buffer(session)
+
+                                case _:
+                                    self.outbox.queue(message.channel, author.id, "Please type either 'ok', 'add', or 're'.")
+
+                            self.srs_app.save_session(session)
+
+                            # the reply and the next card go out as one message
+                            self.outbox.queue(message.channel, author.id, embed = embed)
+                            await self.outbox.flush(message.channel, author.id)
 
-                    # will set self.previous_answer to content (either in kana or processed)
-                    is_correct, correct_readings = self.process_answer(content, False)
+                            return None
+
+                        # don't process any commands
+                        elif content.startswith(self.command_prefix):
+                            await self.bot.process_commands(message)
+
+                            return None
+
+                        # "otherwise"
+                        else:
+
+                            # will set session.previous_answer to content (either in kana or processed)
+                            is_correct, correct_readings = await self.process_answer(session, content, False)
     
-                    if is_correct:
-                        await message.channel.send(":o:")
-                        await message.channel.send(correct_readings)
-                        embed = self.update_embed()
+                            if is_correct:
+                                self.outbox.queue(message.channel, author.id, ":o:")
+                                self.outbox.queue(message.channel, author.id, correct_readings)
+                                embed = await self.update_embed(session)
     
-                    else:
-                        embed = self.wrong_embed(content, correct_readings)
-                        self.showing_wrong_message = True
+                            else:
+                                confused_with = None
+
+                                if session.current_card.card_type == "meaning":
+                                    confused_with = await self.async_srs_app.find_confused_meaning(content, session.current_card.item_id)
+
+                                embed = self.wrong_embed(session, content, correct_readings, confused_with)
+                                session.showing_wrong_message = True
     
-                    await message.channel.send(embed = embed)
+                            self.srs_app.save_session(session)
+                            self.outbox.queue(message.channel, author.id, embed = embed)
+                            await self.outbox.flush(message.channel, author.id)
 
-            if self.debug_mode:
-                print(self.item_dict)
+                        if self.debug_mode:
+                            print(session.attempts)
 
             await self.bot.process_commands(message)
 
@@ -401,50 +475,75 @@ class Bot:
         # if we did, then keep going
         @self.bot.slash_command(name = "start", description = "Start a review session.")
         async def start_review(ctx: commands.Context) -> None:
-            
-            # don't run if app is already started
-            if self.state == AppState.RUNNING:
+            key = self._session_key(ctx.guild, ctx.channel, ctx.author)
+            session = self.srs_app.get_session(key)
+
+            # don't run if this user's session is already started
+            if session.state == AppState.RUNNING:
                 await ctx.respond("Already started...")
 
                 return None
 
-            if not self._start_review():
-                await ctx.respond("No reviews!")
+            # loading the queue hits the db, so acknowledge the interaction first
+            await ctx.defer()
 
-                return None
+            async with session.lock:
+                if not await self._start_review(session):
+                    self.srs_app.end_review_session(key)
+                    await ctx.respond("No reviews!")
 
-            self.update_embed()
+                    return None
 
-            self.review_channel = ctx.channel
-            self.state = AppState.RUNNING
+                session.channel = ctx.channel
+                session.state = AppState.RUNNING
 
-            await ctx.respond("Review session started!")
-            await ctx.send(f"You have **{self.srs_app.len_review_ids}** reviews due.")
-            await ctx.send("Type `/stop` to end the session.")
+                await ctx.respond("Review session started!")
+                self.outbox.queue(ctx, ctx.author.id, f"You have **{session.len_review_ids}** reviews due.")
+                self.outbox.queue(ctx, ctx.author.id, "Type `/stop` to end the session.")
 
-            embed = self.update_embed()
+                embed = await self.update_embed(session)
+                self.srs_app.save_session(session)
 
-            await ctx.channel.send(embed = embed)
+                self.outbox.queue(ctx.channel, ctx.author.id, embed = embed)
+                await self.outbox.flush(ctx.channel, ctx.author.id)
 
             return None
 
         # "stop" should issue a command to stop pushing stuff into the queue
         @self.bot.slash_command(name = "stop", description = "Stop current review session.")
         async def stop_review(ctx: commands.Context) -> None:
+            key = self._session_key(ctx.guild, ctx.channel, ctx.author)
+            session = self.srs_app.sessions.get(key)
 
-            # if app is either flagged to stop or is stopped, then no point in stopping
-            if self.state in [AppState.WILL_STOP, AppState.STOPPED]:
+            # if session is either flagged to stop or is stopped, then no point in stopping
+            if session is None or session.state in [AppState.WILL_STOP, AppState.STOPPED]:
                 await ctx.respond("Already will/has stopped.")
 
                 return None
 
-            self.srs_app.stop_updating_review = True
-            self.state = AppState.WILL_STOP
+            session.stop_updating_review = True
+            session.state = AppState.WILL_STOP
+            self.srs_app.save_session(session)
 
             await ctx.respond("Will quit after the remaining items are completed.")
 
             return None
 
+        # per-stage latency of the answer path, for whoever runs the bot
+        @self.bot.slash_command(name = "metrics", description = "Show hot path latency histograms.")
+        @discord.default_permissions(administrator = True)
+        async def show_metrics(ctx: commands.Context) -> None:
+            lines = metrics.summary()
+
+            if len(lines) == 1:
+                await ctx.respond("Nothing measured yet.", ephemeral = True)
+
+                return None
+
+            await ctx.respond("```\n" + "\n".join(lines) + "\n```", ephemeral = True)
+
+            return None
+
         # "stats" should show important stats to the user
         @self.bot.slash_command(name = "stats", description = "Show stats of current deck.")
         async def show_stats(ctx: commands.Context) -> None:
@@ -454,12 +553,10 @@ class Bot:
             level_names = ["Discovering", "Committing", "Bolstering", "Assimilating", "Set in Stone"]
             level_grades = [[0, 1], [2, 3], [4, 5], [6, 7], [8]]
 
-            df_grade_counts, df_today_counts, df_ratio = self.srs_app.get_review_stats()
-            grade_values = df_grade_counts.iloc[:, -1].tolist()
-
-            df_reviews = self.srs_app.get_due_reviews()
+            stats = await self.async_srs_app.get_stats()
+            grade_values = stats["grade_counts"]
 
-            if grade_values == []:
+            if sum(grade_values) == 0:
                 await ctx.respond("Start adding items and reviewing to see stats!")
 
                 return None
@@ -467,6 +564,7 @@ class Bot:
             # to prevent "failed interaction" when using slash commands
             await ctx.defer()
 
+            # all six embeds fit in one message
             for name, color, grades in zip(level_names, self.colors.progress, level_grades):
                 embed = discord.Embed(
                     title = name,
@@ -474,18 +572,150 @@ class Bot:
                     color = discord.Color.from_rgb(color[0], color[1], color[2])
                 )
 
-                await ctx.send(embed = embed)
+                self.outbox.queue(ctx, ctx.author.id, embed = embed)
 
             embed = discord.Embed(
                 title = "# of Reviews Due",
-                description = f"{len(df_reviews)} / {df_today_counts.values[0][0]}",
+                description = f"{stats['due_now']} / {stats['due_today']}",
                 color = discord.Color.from_rgb(55, 55, 62) # discord's ash embed
             )
 
-            ratio = df_ratio.values.item()
+            ratio = stats["ratio"]
             embed.set_footer(text = f"So far, you got {(ratio * 100):.2f} correct.")
 
-            await ctx.send(embed = embed)
+            self.outbox.queue(ctx, ctx.author.id, embed = embed)
+            await self.outbox.flush(ctx, ctx.author.id)
+
+            return None
+
+        # "add-bulk" adds every item of a jlpt level that isn't in the deck yet
+        # their first reviews are spread out, per_day of them coming due each day
+        @self.bot.slash_command(name = "add-bulk", description = "Add all unstudied items of a JLPT level.")
+        async def add_bulk(
+            ctx: commands.Context,
+            item_type: discord.Option(str, name = "type", choices = ["kanji", "vocab"]),
+            jlpt_level: discord.Option(int, name = "jlpt", description = "N-level, e.g. 4 for N4", min_value = 1, max_value = 5),
+            per_day: discord.Option(int, description = "How many of them come due per day", min_value = 1, default = 100),
+            limit: discord.Option(int, description = "Add at most this many", min_value = 1, default = None),
+        ) -> None:
+
+            # thousands of rows can take a moment
+            await ctx.defer()
+
+            res = await self.async_srs_app.add_review_items_bulk(item_type, jlpt_level, stagger_seconds = 24 * 60 * 60 // per_day, limit = limit)
+
+            if not res["inserted"]:
+                await ctx.respond(f"No unstudied N{jlpt_level} {item_type} left to add.")
+
+                return None
+
+            await ctx.respond(f"Added **{res['inserted']}** N{jlpt_level} {item_type} in {res['seconds']:.2f}s ({res['rows_per_second']:.0f} items/s).")
+
+            return None
+
+        # "discover" pages through dictionary items that aren't in the deck yet
+        # one page is fetched per click of "Next", nothing more is kept around
+        @self.bot.slash_command(name = "discover", description = "Browse dictionary items that aren't in your deck yet.")
+        async def discover(
+            ctx: commands.Context,
+            item_type: discord.Option(str, name = "type", choices = ["kanji", "vocab"]),
+            jlpt_level: discord.Option(int, name = "jlpt", description = "N-level, e.g. 4 for N4 (all levels if left out)", min_value = 1, max_value = 5, default = None),
+        ) -> None:
+            match item_type:
+                case "vocab":
+                    discover_page = self.async_srs_app.discover_vocab_page
+
+                case "kanji":
+                    discover_page = self.async_srs_app.discover_kanji_page
+
+            kwargs = {"condition": f"{item_type[0]}.JlptLevel = {jlpt_level}"} if jlpt_level else {}
+            title = f"Undiscovered N{jlpt_level} {item_type}" if jlpt_level else f"Undiscovered {item_type}"
+
+            await ctx.defer()
+
+            # after_id of the page to fetch next, None once there are no more
+            after_id = 0
+            n_page = 0
+
+            async def next_embed() -> discord.Embed:
+                nonlocal after_id, n_page
+
+                items, after_id = await discover_page(after_id = after_id, page_size = self.discover_page_size, **kwargs)
+                n_page += 1
+
+                embed = discord.Embed(title = f"{title} ({n_page})", color = discord.Color.from_rgb(55, 55, 62))
+
+                for item in items:
+                    reading = item["reading"] if item_type == "vocab" else item["readings"]
+                    value = ", ".join(item["meanings"])
+
+                    if item.get("categories"):
+                        value += f"\n*{', '.join(item['categories'])}*"
+
+                    if not self._add_item_field(embed, f"{item['writing']} ({reading})", value):
+                        break
+
+                if not items:
+                    embed.description = "Nothing left to discover!"
+
+                return embed
+
+            view = discord.ui.View(timeout = 300)
+            button = discord.ui.Button(label = "Next", style = discord.ButtonStyle.primary)
+
+            # a page loads one at a time, clicks that come in while one loads are dropped
+            # (both would fetch with the same after_id)
+            loading = asyncio.Lock()
+
+            async def on_next(interaction: discord.Interaction) -> None:
+                if interaction.user.id != ctx.author.id:
+                    await interaction.response.send_message("Only whoever ran `/discover` can turn its pages.", ephemeral = True)
+
+                    return None
+
+                if loading.locked():
+                    await interaction.response.defer()
+
+                    return None
+
+                async with loading:
+                    embed = await next_embed()
+                    button.disabled = after_id is None
+
+                    await interaction.response.edit_message(embed = embed, view = view)
+
+                return None
+
+            button.callback = on_next
+            view.add_item(button)
+
+            embed = await next_embed()
+            button.disabled = after_id is None
+
+            await ctx.respond(embed = embed, view = view)
+
+            return None
+
+        # "lookup" searches the dictionary by writing, reading (kana or romaji) or english meaning
+        @self.bot.slash_command(name = "lookup", description = "Search the dictionary.")
+        async def lookup(
+            ctx: commands.Context,
+            query: discord.Option(str, description = "Kanji, kana, romaji or an english meaning"),
+        ) -> None:
+            results = await self.async_srs_app.lookup(query, self.discover_page_size)
+
+            if not results:
+                await ctx.respond(f"Nothing found for `{query}`.")
+
+                return None
+
+            embed = discord.Embed(title = f"Lookup: {query}"[:256], color = discord.Color.from_rgb(55, 55, 62))
+
+            for item in results:
+                if not self._add_item_field(embed, f"{item['writing']} ({item['readings'] or '-'}) · {item['type']}", item["meanings"]):
+                    break
+
+            await ctx.respond(embed = embed)
 
             return None
 
@@ -0,0 +1,112 @@
+import json
+
+from functools import lru_cache
+from importlib import resources
+
+
+# romaji -> kana, using the same table (and the same output) as pyokaka
+# pyokaka tries every key of its table at every position, this walks a trie once instead
+#
+# "nn" is always ん and a hard boundary, so "onna" doesn't turn into a sokuon (おっな)
+# this used to be done by rewriting the input to "nn'" before handing it to pyokaka
+
+# the trie stores a node's kana under this key
+TRIE_VALUE = None
+
+# these never double into a sokuon
+NO_SOKUON = "あいうえおん"
+
+# mirrors how pyokaka builds its table, later entries win
+def load_romaji_table() -> dict:
+    table = json.loads(resources.files("pyokaka").joinpath("transtable.json").read_text(encoding = "utf-8"))
+    romaji_table = dict()
+
+    for kana, keys in table.items():
+        if kana in NO_SOKUON:
+            continue
+
+        for key in keys:
+            romaji_table[key] = kana
+
+        # "kka" -> っか
+        for key in keys:
+            romaji_table[key[0] + key] = "っ" + kana
+
+    for kana, keys in table.items():
+        if kana in NO_SOKUON:
+            for key in keys:
+                romaji_table[key] = kana
+
+    romaji_table["'"] = ""
+    romaji_table["-"] = "ー"
+
+    return romaji_table
+
+class KanaTransliterator:
+    def __init__(self, romaji_table: dict):
+        self.trie = dict()
+
+        for key, kana in romaji_table.items():
+            node = self.trie
+
+            for char in key:
+                node = node.setdefault(char, dict())
+
+            node[TRIE_VALUE] = kana
+
+    # greedy longest match from every position, unknown characters are kept as is
+    def convert(self, string: str) -> str:
+        string = string.lower()
+        n_chars = len(string)
+        parts = []
+        i = 0
+
+        while i < n_chars:
+            if string.startswith("nn", i):
+                parts.append("ん")
+                i += 2
+
+                continue
+
+            node = self.trie
+            match_kana = None
+            match_len = 0
+            j = i
+
+            while j < n_chars:
+                node = node.get(string[j])
+
+                if node is None:
+                    break
+
+                j += 1
+
+                if TRIE_VALUE in node:
+                    match_kana = node[TRIE_VALUE]
+                    match_len = j - i
+
+            if match_len == 0:
+                parts.append(string[i])
+                i += 1
+
+            else:
+                parts.append(match_kana)
+                i += match_len
+
+        return "".join(parts)
+
+    # converts a batch, each distinct string only once
+    def convert_bulk(self, strings: list[str]) -> list[str]:
+        converted = {string: self.convert(string) for string in set(strings)}
+
+        return [converted[string] for string in strings]
+
+transliterator = KanaTransliterator(load_romaji_table())
+
+# answers repeat a lot (retries, common readings), so keep recent ones
+@lru_cache(maxsize = 4096)
+def romaji_to_kana(string: str) -> str:
+    return transliterator.convert(string)
+
+def romaji_to_kana_bulk(strings: list[str]) -> list[str]:
+    return transliterator.convert_bulk(strings)
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+import time
+
+from src.kana import romaji_to_kana
+from src.reader_pool import sqlite_uri
+
+
+# full text index over the dictionary for /lookup, kept in its own sidecar database
+# one fts5 row per vocab/kanji: its writing, readings and english meanings
+# built once from the dictionary, and only built again when the dictionary file changes (mtime or size)
+#
+# readings are stored in hiragana, and queries are normalized the same way,
+# so "taberu", "たべる" and "タベル" all find 食べる
+
+# katakana -> hiragana, the two blocks are 0x60 apart
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+def to_hiragana(string: str) -> str:
+    if string is None:
+        return None
+
+    return string.translate(KATAKANA_TO_HIRAGANA)
+
+# fts5 would read quotes, stars and such as query syntax, so every term goes in as a quoted prefix
+def fts_terms(string: str) -> list[str]:
+    return ['"' + term.replace('"', '""') + '"*' for term in string.split()]
+
+class LookupIndex:
+    def __init__(self, path_to_full_db: str, path_to_lookup_db: str):
+        self.path_to_full_db = path_to_full_db
+        self.path_to_lookup_db = path_to_lookup_db
+
+        # lookups come from the reader threads, they take milliseconds, so one connection behind a lock is enough
+        self.conn = None
+        self.lock = threading.Lock()
+
+        # set once the index is known to be built and current
+        self.valid = False
+
+    # what the index was built from, a different one means the dictionary was replaced
+    def dictionary_version(self) -> str:
+        stat = os.stat(self.path_to_full_db)
+
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    # open the sidecar, (re)building it if it is missing or stale
+    # returns the seconds the build took, or None if the index was up to date
+    def ensure(self) -> float:
+        self.conn = sqlite3.connect(sqlite_uri(self.path_to_lookup_db, mode = "rwc"), uri = True, check_same_thread = False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS LookupMeta (Key TEXT PRIMARY KEY, Value TEXT);")
+
+        row = self.conn.execute("SELECT Value FROM LookupMeta WHERE Key = 'dictionary_version';").fetchone()
+
+        if row is not None and row[0] == self.dictionary_version():
+            self.valid = True
+
+            return None
+
+        return self.rebuild()
+
+    # one transaction, so a build that gets interrupted leaves the old index (or none) behind, never half of one
+    def rebuild(self) -> float:
+        start = time.perf_counter()
+        version = self.dictionary_version()
+        self.valid = False
+
+        with self.lock:
+            self.conn.create_function("to_hiragana", 1, to_hiragana, deterministic = True)
+            self.conn.execute("ATTACH DATABASE ? AS dictionary;", (sqlite_uri(self.path_to_full_db, mode = "ro", immutable = 1),))
+
+            try:
+
+                # sqlite3 doesn't open a transaction for DDL on its own, the DROP and CREATE would commit right away
+                # and a failed build would leave an empty table behind
+                self.conn.execute("BEGIN;")
+                self.conn.execute("DROP TABLE IF EXISTS Lookup;")
+
+                # prefix indexes for the short kanji/kana queries, and no diacritic folding so が doesn't match か
+                self.conn.execute("""
+                                  CREATE VIRTUAL TABLE Lookup USING fts5(
+                                      ItemType UNINDEXED,
+                                      Writing,
+                                      Readings,
+                                      Meanings,
+                                      prefix = '1 2 3',
+                                      tokenize = 'unicode61 remove_diacritics 0'
+                                  );
+                                  """)
+                self.conn.execute("""
+                                  INSERT INTO Lookup (ItemType, Writing, Readings, Meanings)
+                                  SELECT 'vocab', COALESCE(v.KanjiWriting, v.KanaWriting), to_hiragana(v.KanaWriting), GROUP_CONCAT(v_meaning.Meaning, ', ')
+                                  FROM dictionary.VocabSet AS v
+                                  JOIN dictionary.VocabEntityVocabMeaning AS v_link ON v_link.VocabEntity_ID = v.ID
+                                  JOIN dictionary.VocabMeaningSet AS v_meaning ON v_meaning.ID = v_link.Meanings_ID
+                                  GROUP BY v.ID;
+                                  """)
+                self.conn.execute("""
+                                  INSERT INTO Lookup (ItemType, Writing, Readings, Meanings)
+                                  SELECT 'kanji', k.Character, to_hiragana(TRIM(COALESCE(k.OnYomi, '') || ',' || COALESCE(k.KunYomi, ''), ',')), GROUP_CONCAT(k_meaning.Meaning, ', ')
+                                  FROM dictionary.KanjiSet AS k
+                                  JOIN dictionary.KanjiMeaningSet AS k_meaning ON k_meaning.Kanji_ID = k.ID
+                                  GROUP BY k.ID;
+                                  """)
+                self.conn.execute("INSERT INTO Lookup (Lookup) VALUES ('optimize');")
+                self.conn.execute("INSERT OR REPLACE INTO LookupMeta (Key, Value) VALUES ('dictionary_version', ?);", (version,))
+                self.conn.commit()
+                self.valid = True
+
+            except Exception:
+                self.conn.rollback()
+
+                raise
+
+            finally:
+                self.conn.execute("DETACH DATABASE dictionary;")
+
+        return time.perf_counter() - start
+
+    # best matches for a query, ranked by bm25 (a hit on the writing counts most, then readings, then meanings)
+    # japanese is looked up in the writing and readings, anything else in the meanings and, as romaji, the readings
+    # returns dicts of {"type", "writing", "readings", "meanings"}
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        query = query.strip()
+
+        if not query or not self.valid:
+            return []
+
+        if query.isascii():
+            match = f"Meanings : ({' AND '.join(fts_terms(query.lower()))})"
+            kana = romaji_to_kana(query.replace(" ", ""))
+
+            # only if all of it was romaji
+            if not any(char.isascii() for char in kana):
+                match += f" OR Readings : ({' AND '.join(fts_terms(kana))})"
+
+        else:
+            terms = " AND ".join(fts_terms(to_hiragana(query)))
+            match = f"Writing : ({' AND '.join(fts_terms(query))}) OR Readings : ({terms})"
+
+        q = """
+            SELECT ItemType, Writing, Readings, Meanings FROM Lookup
+            WHERE Lookup MATCH ?
+            ORDER BY bm25(Lookup, 0, 10.0, 5.0, 1.0)
+            LIMIT ?;
+            """
+
+        with self.lock:
+            rows = self.conn.execute(q, (match, limit)).fetchall()
+
+        return [{"type": item_type, "writing": writing, "readings": readings, "meanings": meanings} for item_type, writing, readings, meanings in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                self.valid = False
+
+        return None
@@ -0,0 +1,119 @@
+import math
+
+from collections import defaultdict
+
+
+# every meaning in the deck, normalized the same way as a card's answer index,
+# so a wrong meaning answer can be checked against the whole deck ("that's the meaning of X")
+# kept up to date by the app's writes, like the stats cache
+#
+# two strings can only score >= threshold with QRatio if their lengths are close enough,
+# so meanings are bucketed by length and a lookup only scores the buckets that could match
+class MeaningIndex:
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self) -> None:
+        self.valid = False
+
+        # normalized meaning -> ids of the items that have it
+        self.owners = defaultdict(set)
+
+        # length -> normalized meanings of that length
+        self.buckets = defaultdict(list)
+
+        # item id -> (prompt, normalized meanings), needed to undo an item's old meanings
+        self.items = dict()
+
+        return None
+
+    # rows of (id, prompt, answer index of its meaning card)
+    def rebuild(self, rows: list) -> None:
+        self.reset()
+
+        for item_id, prompt, answer_index in rows:
+            self.set_item(item_id, prompt, answer_index)
+
+        self.valid = True
+
+        return None
+
+    def remove_item(self, item_id: int) -> None:
+        previous = self.items.pop(item_id, None)
+
+        if previous is None:
+            return None
+
+        _, meanings = previous
+
+        for meaning in meanings:
+            owners = self.owners[meaning]
+            owners.discard(item_id)
+
+            if not owners:
+                del self.owners[meaning]
+                self.buckets[len(meaning)].remove(meaning)
+
+        return None
+
+    # an item was added or its meanings changed
+    # without a prompt, the item keeps the one it had
+    def set_item(self, item_id: int, prompt: str, answer_index: dict) -> None:
+        if prompt is None and item_id in self.items:
+            prompt = self.items[item_id][0]
+
+        self.remove_item(item_id)
+
+        meanings = {meaning for meaning in answer_index if meaning}
+        self.items[item_id] = (prompt, meanings)
+
+        for meaning in meanings:
+            if meaning not in self.owners:
+                self.buckets[len(meaning)].append(meaning)
+
+            self.owners[meaning].add(item_id)
+
+        return None
+
+    # best match of an answer among the meanings of every other item
+    # returns (prompt, matched meaning, score), or None if nothing scores over the threshold
+    def lookup(self, answer: str, exclude_id: int = None) -> tuple:
+        answer = answer.strip().lower()
+
+        if not answer:
+            return None
+
+        candidates = []
+
+        # an exact match only counts if it belongs to some other item, otherwise the fuzzy search still runs
+        if any(item_id != exclude_id for item_id in self.owners.get(answer, ())):
+            candidates.append((answer, 100))
+
+        else:
+            from rapidfuzz import process, fuzz
+
+            # QRatio <= 100 * (1 - |a - b| / (a + b)), so reaching the threshold needs |a - b| / (a + b) <= r
+            # bounds are rounded outwards, a bucket too many costs little, one too few misses matches
+            r = (100 - self.threshold) / 100
+            min_length = math.floor(len(answer) * (1 - r) / (1 + r))
+            max_length = math.ceil(len(answer) * (1 + r) / (1 - r)) if r < 1 else max(self.buckets, default = 0)
+
+            for length in range(min_length, max_length + 1):
+                bucket = self.buckets.get(length)
+
+                if not bucket:
+                    continue
+
+                # no limit, the best few could all belong to the excluded item
+                for meaning, score, _ in process.extract(answer, bucket, scorer = fuzz.QRatio, score_cutoff = self.threshold, limit = None):
+                    candidates.append((meaning, score))
+
+        candidates.sort(key = lambda candidate: candidate[1], reverse = True)
+
+        for meaning, score in candidates:
+            for item_id in self.owners[meaning]:
+                if item_id != exclude_id:
+                    return self.items[item_id][0], meaning, score
+
+        return None
@@ -0,0 +1,167 @@
+import inspect
+import os
+import threading
+import time
+
+from bisect import bisect_left
+from functools import wraps
+
+
+# latency histograms for the stages of handling an answer
+# spans are recorded from both the event loop and the db thread, so updates are locked
+# exposed through /metrics and, optionally, a prometheus text file
+
+# upper bounds in seconds, the last bucket catches everything else
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+        return None
+
+    # upper bound of the bucket holding the q-th observation (never above the largest one seen)
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+
+        for i, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+
+        return self.max
+
+# times whatever runs inside it, usable with both "with" and "async with"
+class Span:
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+class Metrics:
+    def __init__(self):
+        self.histograms = dict()
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(name)
+
+            if histogram is None:
+                histogram = Histogram()
+                self.histograms[name] = histogram
+
+            histogram.observe(seconds)
+
+        return None
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    # decorator version of span, works for both plain and async functions
+    def timed(self, name: str):
+        def decorator(f):
+            if inspect.iscoroutinefunction(f):
+
+                @wraps(f)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await f(*args, **kwargs)
+
+                return async_wrapper
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return f(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms = dict()
+
+        return None
+
+    # one line per stage for /metrics
+    def summary(self) -> list[str]:
+        lines = [f"{'stage':<26}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}"]
+
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                mean = histogram.sum / histogram.count if histogram.count else 0.0
+
+                lines.append(
+                    f"{name:<26}{histogram.count:>8}"
+                    f"{mean * 1e3:>8.2f}ms{histogram.quantile(0.5) * 1e3:>8.2f}ms"
+                    f"{histogram.quantile(0.95) * 1e3:>8.2f}ms{histogram.max * 1e3:>8.2f}ms"
+                )
+
+        return lines
+
+    def render_prometheus(self) -> str:
+        metric = "srsly_stage_latency_seconds"
+        lines = [
+            f"# HELP {metric} Latency of the stages of handling a review answer.",
+            f"# TYPE {metric} histogram",
+        ]
+
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+
+                lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+    # written to a temp file first, so a scraper never reads half a file
+    def write_prometheus(self, path: str) -> None:
+        path_tmp = path + ".tmp"
+
+        with open(path_tmp, "w") as f:
+            f.write(self.render_prometheus())
+
+        os.replace(path_tmp, path)
+
+        return None
+
+# shared by the app and the bot
+metrics = Metrics()
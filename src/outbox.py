@@ -0,0 +1,103 @@
+import asyncio
+
+from src.dataclasses import PendingMessage
+
+
+# per-learner outbound message coalescer
+# everything queued for one user in a channel goes out as one send (content joined by newlines, up to 10 embeds)
+# parts are kept per (channel, user), so two learners reviewing in the same channel never get each other's parts
+# discord's message rate limit bucket is per channel though, so sends to a channel are serialized behind one lock,
+# and whatever a learner queues while a send waits on the bucket is merged into their next one
+
+# discord's limits for a single message
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_LENGTH = 6000
+
+class Outbox:
+    def __init__(self, send):
+
+        # send(target, content, embeds = ...), i.e. Bot._send
+        self.send = send
+
+        # (channel id, user id) -> PendingMessage
+        self.pending = dict()
+
+        # channel id -> lock
+        self.locks = dict()
+
+    # ctx and channels can both be targets, they share the channel's bucket
+    def _channel_id(self, target) -> int:
+        return getattr(target, "channel", target).id
+
+    def queue(self, target, user_id: int, content: str = None, embed = None) -> None:
+        key = (self._channel_id(target), user_id)
+        message = self.pending.get(key)
+
+        if message is None:
+            message = PendingMessage(target)
+            self.pending[key] = message
+
+        if content is not None:
+            message.contents.append(str(content))
+
+        if embed is not None:
+            message.embeds.append(embed)
+
+        return None
+
+    # split the queued parts into as few messages as discord allows
+    def _batches(self, message: PendingMessage) -> list[tuple[str, list]]:
+        batches = []
+        content = ""
+
+        for part in message.contents:
+            if content and len(content) + 1 + len(part) > MAX_CONTENT_LENGTH:
+                batches.append((content, []))
+                content = ""
+
+            content = f"{content}\n{part}" if content else part
+
+        embeds = []
+        embeds_length = 0
+
+        for embed in message.embeds:
+            if len(embeds) == MAX_EMBEDS or (embeds and embeds_length + len(embed) > MAX_EMBED_LENGTH):
+                batches.append((content or None, embeds))
+                content = ""
+                embeds = []
+                embeds_length = 0
+
+            embeds.append(embed)
+            embeds_length += len(embed)
+
+        if content or embeds:
+            batches.append((content or None, embeds))
+
+        return batches
+
+    # send everything queued for the user in the target's channel
+    # if another flush already took our parts along, there is nothing left to do
+    async def flush(self, target, user_id: int) -> None:
+        channel_id = self._channel_id(target)
+        lock = self.locks.get(channel_id)
+
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[channel_id] = lock
+
+        async with lock:
+            message = self.pending.pop((channel_id, user_id), None)
+
+            if message is None:
+                return None
+
+            for content, embeds in self._batches(message):
+                await self.send(message.target, content, embeds = embeds or None)
+
+        return None
+
+    async def send_now(self, target, user_id: int, content: str = None, embed = None) -> None:
+        self.queue(target, user_id, content, embed)
+
+        return await self.flush(target, user_id)
@@ -0,0 +1,143 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# read-only connections for dictionary scans (discovery, lookups)
+# the dictionary never changes while the bot runs, so it is opened immutable (no locking, no change checks)
+# and memory mapped, srs.db is attached read-only so cross database queries still work
+# these connections never write, so a long scan here doesn't hold up review writes on the main connection
+#
+# optionally, the dictionary is copied into a shared-cache memory database at startup instead,
+# with indexes for the discovery joins built there, and every reader opens that copy
+
+# indexes houhou's dictionary doesn't ship with, but the discovery joins want
+# name -> (table, column)
+dictionary_indexes = {
+    "idx_vocab_kanji_writing": ("VocabSet", "KanjiWriting"),
+    "idx_vocab_meaning_link": ("VocabEntityVocabMeaning", "VocabEntity_ID"),
+    "idx_vocab_category_link": ("VocabMeaningVocabCategory", "VocabMeaningVocabCategory_VocabCategory_ID"),
+    "idx_kanji_character": ("KanjiSet", "Character"),
+    "idx_kanji_meaning_kanji": ("KanjiMeaningSet", "Kanji_ID"),
+}
+
+# sqlite wants uri paths, so spaces and such in a path need to be escaped
+def sqlite_uri(path: str, **params) -> str:
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+
+    return f"{Path(path).resolve().as_uri()}?{query}"
+
+class ReaderPool:
+    def __init__(self, path_to_full_db: str, path_to_srs_db: str, id_srs_db: str, size: int = 2, mmap_size: int = 256 * 1024 * 1024, cache_size_kib: int = 64 * 1024):
+        self.path_to_full_db = path_to_full_db
+        self.path_to_srs_db = path_to_srs_db
+        self.id_srs_db = id_srs_db
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        # set by load_into_memory
+        # the memory database lives as long as at least one connection to it is open, so one is kept aside
+        self.memory_uri = None
+        self.memory_conn = None
+
+        # connections are made lazily, up to size of them
+        self.idle = queue.Queue()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def open(self) -> sqlite3.Connection:
+
+        # a connection is handed from thread to thread, but only ever used by one at a time
+        if self.memory_uri:
+            conn = sqlite3.connect(self.memory_uri, uri = True, check_same_thread = False)
+
+        else:
+            conn = sqlite3.connect(sqlite_uri(self.path_to_full_db, mode = "ro", immutable = 1), uri = True, check_same_thread = False)
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)};")
+
+        # negative means KiB instead of pages
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)};")
+        conn.execute("PRAGMA query_only = 1;")
+
+        # srs.db is written to while we read, so it can't be immutable, but wal lets us read a snapshot without blocking the writer
+        conn.execute(f"ATTACH DATABASE ? AS {self.id_srs_db};", (sqlite_uri(self.path_to_srs_db, mode = "ro"),))
+
+        return conn
+
+    # copy the dictionary into memory with the backup api and index it there
+    # has to run before the first reader is opened, returns (seconds taken, bytes in memory)
+    def load_into_memory(self) -> tuple[float, int]:
+        start = time.perf_counter()
+
+        # named after the pool, so two apps in one process don't share a copy
+        memory_uri = f"file:srsly_dictionary_{id(self)}?mode=memory&cache=shared"
+        memory_conn = sqlite3.connect(memory_uri, uri = True, check_same_thread = False)
+        source = sqlite3.connect(sqlite_uri(self.path_to_full_db, mode = "ro", immutable = 1), uri = True)
+
+        try:
+            source.backup(memory_conn)
+
+        finally:
+            source.close()
+
+        tables = {row[0] for row in memory_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+
+        for name_index, (table, column) in dictionary_indexes.items():
+            if table in tables:
+                memory_conn.execute(f"CREATE INDEX IF NOT EXISTS {name_index} ON {table} ({column});")
+
+        memory_conn.execute("ANALYZE;")
+        memory_conn.commit()
+
+        page_count = memory_conn.execute("PRAGMA page_count;").fetchone()[0]
+        page_size = memory_conn.execute("PRAGMA page_size;").fetchone()[0]
+
+        self.memory_conn = memory_conn
+        self.memory_uri = memory_uri
+
+        return time.perf_counter() - start, page_count * page_size
+
+    # borrow a connection for the duration of the block
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self.idle.get_nowait()
+
+        except queue.Empty:
+            with self.lock:
+                can_open = len(self.connections) < self.size
+
+                if can_open:
+                    conn = self.open()
+                    self.connections.append(conn)
+
+            # everyone is busy, wait for one to come back
+            if not can_open:
+                conn = self.idle.get()
+
+        try:
+            yield conn
+
+        finally:
+            self.idle.put(conn)
+
+    def close(self) -> None:
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+
+            self.connections = []
+            self.idle = queue.Queue()
+
+            # last connection to the memory copy, this frees it
+            if self.memory_conn is not None:
+                self.memory_conn.close()
+                self.memory_conn = None
+                self.memory_uri = None
+
+        return None
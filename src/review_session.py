@@ -0,0 +1,206 @@
+import asyncio
+import random
+import re
+
+from collections import deque
+from typing import Optional
+
+from src.dataclasses import AppState, SessionKey
+
+
+# compiled once, used to normalize meanings
+re_in_parentheses = re.compile(r"\s*\([^)]*\)\s*")
+re_parentheses = re.compile(r"[()]")
+
+# builds the lookup of every accepted answer for a card
+# returns the raw comma separated responses (for display) and normalized answer -> response
+def build_answer_index(card_type: str, responses: str) -> tuple[list[str], dict]:
+    valid_responses = responses.split(",")
+    answer_index = dict()
+
+    match card_type:
+
+        # reading cards should be strict, since a mistype of kana usually means a different word
+        case "reading":
+            for response in valid_responses:
+                answer_index[response.strip()] = response
+
+        # meanings are matched loosely, with and without whatever is in parentheses
+        case "meaning":
+            for response in valid_responses:
+                response_lower = response.strip().lower()
+
+                answer_index[re_parentheses.sub("", response_lower)] = response
+                answer_index[re_in_parentheses.sub("", response_lower)] = response
+
+    return valid_responses, answer_index
+
+# an item's row from SrsEntrySet
+# a plain dict can't be weakly referenced, this can, so the app's map of shared rows (SrsApp.rows)
+# forgets an item once no card or prefetch buffer holds it anymore
+class ItemRow(dict):
+    __slots__ = ("__weakref__",)
+
+# one card of an item (its reading or its meaning)
+# every card of an item, in any session, shares the item's row, so an edit to the row shows up in all of them
+# the answer index is built from the row on first use, and built again whenever the row's responses change
+class Card:
+    __slots__ = ("row", "card_type", "indexed_responses", "index")
+
+    def __init__(self, row: ItemRow, card_type: str):
+        self.row = row
+        self.card_type = card_type
+        self.indexed_responses = None
+        self.index = None
+
+    # (valid answers, answer index) for the row's current responses
+    def answers(self) -> tuple[list[str], dict]:
+        responses = self.expected_answer
+
+        if responses != self.indexed_responses:
+            self.index = build_answer_index(self.card_type, responses)
+            self.indexed_responses = responses
+
+        return self.index
+
+    @property
+    def valid_answers(self) -> list[str]:
+        return self.answers()[0]
+
+    @property
+    def answer_index(self) -> dict:
+        return self.answers()[1]
+
+    @property
+    def item_id(self) -> int:
+        return self.row["ID"]
+
+    @property
+    def readings(self) -> str:
+        return self.row["Readings"]
+
+    @property
+    def meanings(self) -> str:
+        return self.row["Meanings"]
+
+    @property
+    def kanji(self) -> Optional[str]:
+        return self.row["AssociatedKanji"]
+
+    @property
+    def vocab(self) -> Optional[str]:
+        return self.row["AssociatedVocab"]
+
+    @property
+    def review_type(self) -> Optional[str]:
+        if self.kanji:
+            return "kanji"
+
+        if self.vocab:
+            return "vocab"
+
+        return None
+
+    @property
+    def prompt(self) -> Optional[str]:
+        return self.kanji or self.vocab
+
+    @property
+    def expected_answer(self) -> str:
+        return self.readings if self.card_type == "reading" else self.meanings
+
+# everything one learner needs to review in one channel
+# the app fills the queue, the bot answers from its front
+#
+# queue: cards waiting to be answered, the front one is shown
+# new cards go in at a random position, a wrong card goes to the back
+# attempts: item id -> [correct answers, submitted answers], an item is done at 2 correct answers (one per card)
+class ReviewSession:
+    __slots__ = (
+        "key", "channel", "state",
+        "due_review_ids", "prefetched_reviews", "len_review_ids", "current_completed", "stop_updating_review",
+        "queue", "attempts", "current_card", "showing_wrong_message", "previous_answer",
+        "lock",
+    )
+
+    def __init__(self, key: SessionKey):
+        self.key = key
+        self.channel = None
+        self.state = AppState.STOPPED
+
+        # queue state
+        self.due_review_ids = []
+        self.prefetched_reviews = []
+        self.len_review_ids = 0
+        self.current_completed = 0
+        self.stop_updating_review = False
+        self.queue = deque()
+
+        # answer state
+        self.attempts = dict()
+        self.current_card = None
+        self.showing_wrong_message = False
+        self.previous_answer = None
+
+        # db calls are awaited, so serialize handlers of the same session
+        self.lock = asyncio.Lock()
+
+    # clear everything but the key, channel, state and lock
+    def reset(self) -> None:
+        self.due_review_ids = []
+        self.prefetched_reviews = []
+        self.len_review_ids = 0
+        self.current_completed = 0
+        self.stop_updating_review = False
+        self.queue.clear()
+        self.attempts = dict()
+        self.current_card = None
+
+        return None
+
+    def front(self) -> Optional[Card]:
+        return self.queue[0] if self.queue else None
+
+    # the queue only ever holds a couple dozen cards, so inserting anywhere is cheap
+    def insert_randomly(self, card: Card) -> None:
+        self.queue.insert(random.randint(0, len(self.queue)), card)
+
+        return None
+
+    # take the front card off the queue, putting it at the back if it has to be asked again
+    def pop_front(self, requeue: bool) -> Card:
+        card = self.queue.popleft()
+
+        if requeue:
+            self.queue.append(card)
+
+        return card
+
+    # drop a requeued card (usually the last one) once it counts as answered after all
+    def remove(self, card: Card) -> None:
+        if self.queue and self.queue[-1] is card:
+            self.queue.pop()
+
+        else:
+            self.queue.remove(card)
+
+        return None
+
+    # count a submitted answer for an item
+    # returns (whether both of its cards are done, whether both were right on the first try)
+    def record_attempt(self, item_id: int, correct: bool) -> tuple[bool, bool]:
+        counters = self.attempts.get(item_id)
+
+        if counters is None:
+            counters = [0, 0]
+            self.attempts[item_id] = counters
+
+        counters[0] += correct
+        counters[1] += 1
+
+        if counters[0] < 2:
+            return False, False
+
+        del self.attempts[item_id]
+
+        return True, counters[1] == 2
@@ -1,12 +1,25 @@
-import pandas as pd
+import os
 import sqlite3
-import random
+import time
+import json
+import threading
+import weakref
 
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from typing import TYPE_CHECKING
 
-from pandas.core.frame import DataFrame
-from src.dataclasses import SrsConfig
+from src.dataclasses import SrsConfig, SessionKey, AppState
+from src.review_session import ReviewSession, Card, ItemRow, build_answer_index
+from src.stats_cache import StatsCache, end_of_local_day
+from src.meaning_index import MeaningIndex
+from src.lookup_index import LookupIndex
+from src.reader_pool import ReaderPool, sqlite_uri
+from src.metrics import metrics
+
+# pandas takes a good chunk of startup and is only needed for stats and deck queries, so it is imported on first use
+if TYPE_CHECKING:
+    from pandas.core.frame import DataFrame
 
 # decorator to handle if db connection is not established
 # returns None if no connection
@@ -34,6 +47,7 @@ class SrsApp:
             "failure_col": "FailureCount",
             "success_col": "SuccessCount",
             "date_col": "NextAnswerDateISO",
+            "due_epoch_col": "NextAnswerEpoch",
             "vocab_col": "AssociatedVocab",
             "kanji_col": "AssociatedKanji",
             "id_col": "ID",
@@ -43,41 +57,190 @@ class SrsApp:
             "houhou_suspension_col": "SuspensionDate",
         }
 
+        # indexes kept on the hot SrsEntrySet columns
+        # name -> (column, partial index condition or None)
+        self.srs_indexes = {
+            "idx_srs_next_answer_epoch": (self.col_dict["due_epoch_col"], f"{self.col_dict['due_epoch_col']} IS NOT NULL"),
+            "idx_srs_associated_vocab": (self.col_dict["vocab_col"], None),
+            "idx_srs_associated_kanji": (self.col_dict["kanji_col"], None),
+        }
+
+        # indexes that were replaced, dropped when found
+        # the due index used to be on the iso text column, it is on the epoch column now
+        self.obsolete_srs_indexes = ["idx_srs_next_answer_due"]
+
         # set initial definitions from dataclass
         self.max_reviews_at_once = config.max_reviews_at_once
         self.entries_before_commit = config.entries_before_commit
+        self.max_commit_latency = config.max_commit_latency
         self.match_score_threshold = config.match_score_threshold
         self.srs_interval = config.srs_interval
         self.path_to_srs_db = config.path_to_srs_db
         self.path_to_full_db = config.path_to_full_db
+        self.dictionary_readers = config.dictionary_readers
+        self.dictionary_mmap_size = config.dictionary_mmap_size
+        self.dictionary_in_memory = config.dictionary_in_memory
 
         # variables shared between app and ui
         self.id_srs_db = "srs_db"
         self.name_srs_table = self.id_srs_db + ".SrsEntrySet"
+        self.name_interval_table = "temp.SrsInterval"
+        self.name_session_table = self.id_srs_db + ".ReviewSessionSnapshot"
+        self.name_migration_table = self.id_srs_db + ".SrsMigration"
+        self.max_srs_grade = max(int(x) for x in self.srs_interval.keys())
         self.conn = None
         self.cursor = None
+        self.readers = None
         self.entries_without_commit = 0
-        self.due_review_ids = []
-        self.len_review_ids = 0
-        self.reset_review_variables()
+        self.first_uncommitted_time = None
+        self.stats_cache = StatsCache(self.max_srs_grade)
+        self.meaning_index = MeaningIndex(self.match_score_threshold)
+
+        # the /lookup index lives next to srs.db unless configured otherwise
+        path_to_lookup_db = config.path_to_lookup_db or os.path.join(os.path.dirname(self.path_to_srs_db), "lookup.db")
+        self.lookup_index = LookupIndex(self.path_to_full_db, path_to_lookup_db)
+
+        # every active review session, keyed by (guild, channel, user)
+        self.sessions = {}
+
+        # item id -> the one row every session's cards and prefetch buffers share for it
+        # an entry goes away with the last card or buffer holding the row
+        self.rows = weakref.WeakValueDictionary()
+
+        # session key -> serialized snapshot (None to delete it), written with the next commit
+        # filled from the event loop, drained on the db thread, hence the lock
+        self.pending_snapshots = dict()
+        self.snapshot_lock = threading.Lock()
+
+    # returns the session for a key, creating it if needed
+    def get_session(self, key: SessionKey) -> ReviewSession:
+        session = self.sessions.get(key)
+
+        if session is None:
+            session = ReviewSession(key = key)
+            self.sessions[key] = session
+
+        return session
 
-    # reset a few variables
-    def reset_review_variables(self) -> None:
-        self.current_index = 0
-        self.current_completed = 0
-        self.stop_updating_review = False
-        self.current_reviews = []
+    # forget a session once it is done
+    def end_review_session(self, key: SessionKey) -> None:
+        self.sessions.pop(key, None)
+        self.queue_snapshot(key, None)
 
         return None
 
+    # snapshots ride along with the next commit, so a burst of answers is a single write,
+    # and a snapshot never claims progress that the grades in the db don't have
+    def queue_snapshot(self, key: SessionKey, snapshot: str) -> None:
+        with self.snapshot_lock:
+            self.pending_snapshots[key] = snapshot
+
+            # make sure the flusher commits it, even if nothing else gets written
+            if self.first_uncommitted_time is None:
+                self.first_uncommitted_time = time.monotonic()
+
+        return None
+
+    # remember where a session is, as ids and attempt counters, so it survives a restart
+    def save_session(self, session: ReviewSession) -> None:
+        if session.state == AppState.STOPPED:
+            return None
+
+        id_col = self.col_dict["id_col"]
+
+        snapshot = {
+            "state": session.state.name,
+            "due": session.due_review_ids,
+            "prefetched": [row[id_col] for row in session.prefetched_reviews],
+            "cards": [[card.item_id, card.card_type] for card in session.queue],
+            "completed": session.current_completed,
+            "total": session.len_review_ids,
+            "stop": session.stop_updating_review,
+            "attempts": session.attempts,
+        }
+
+        self.queue_snapshot(session.key, json.dumps(snapshot, separators = (",", ":")))
+
+        return None
+
+    # write (or delete) the queued snapshots in the current transaction
+    @check_conn
+    def write_session_snapshots(self) -> None:
+        with self.snapshot_lock:
+            pending = self.pending_snapshots
+            self.pending_snapshots = dict()
+
+        if not pending:
+            return None
+
+        q_save = f"""
+                 INSERT INTO {self.name_session_table} (SessionKey, Snapshot, UpdatedISO)
+                 VALUES (?, ?, current_timestamp)
+                 ON CONFLICT (SessionKey) DO UPDATE SET
+                     Snapshot = excluded.Snapshot,
+                     UpdatedISO = excluded.UpdatedISO;
+                 """
+        q_delete = f"DELETE FROM {self.name_session_table} WHERE SessionKey = ?;"
+
+        self.conn.executemany(q_save, [(json.dumps(key), snapshot) for key, snapshot in pending.items() if snapshot is not None])
+        self.conn.executemany(q_delete, [(json.dumps(key),) for key, snapshot in pending.items() if snapshot is None])
+
+        return None
+
+    # bring back the sessions that were running when the bot went down
+    # the queued cards and the prefetch buffer are hydrated by id, the due ids are taken as they were
+    @check_conn
+    def restore_sessions(self) -> list[ReviewSession]:
+        id_col = self.col_dict["id_col"]
+        sessions = []
+
+        for session_key, snapshot in self.conn.execute(f"SELECT SessionKey, Snapshot FROM {self.name_session_table};").fetchall():
+            key = tuple(json.loads(session_key))
+            snapshot = json.loads(snapshot)
+
+            item_ids = list({item_id for item_id, _ in snapshot["cards"]} | set(snapshot["prefetched"]))
+            rows_by_id = dict()
+
+            if item_ids:
+                q = f"""
+                    SELECT * FROM {self.name_srs_table}
+                    WHERE {id_col} IN ({", ".join("?" * len(item_ids))});
+                    """
+
+                rows_by_id = {row[id_col]: self.share_row(row) for row in self.fetch_rows(q, tuple(item_ids))}
+
+            session = self.get_session(key)
+            session.reset()
+
+            # items deleted in the meantime are just skipped
+            session.queue.extend(self.make_card(rows_by_id[item_id], card_type) for item_id, card_type in snapshot["cards"] if item_id in rows_by_id)
+            session.prefetched_reviews = [rows_by_id[item_id] for item_id in snapshot["prefetched"] if item_id in rows_by_id]
+            session.due_review_ids = snapshot["due"]
+            session.current_completed = snapshot["completed"]
+            session.len_review_ids = snapshot["total"]
+            session.stop_updating_review = snapshot["stop"]
+            session.attempts = {int(item_id): attempts for item_id, attempts in snapshot["attempts"].items()}
+            session.state = AppState[snapshot["state"]]
+
+            if not session.queue:
+                self.end_review_session(key)
+
+                continue
+
+            sessions.append(session)
+
+        return sessions
+
     # initialize sql connection to db
-    def init_db(self) -> bool:
+    # load_caches = False skips the stats cache and the meaning index, for when the bot isn't going to run (see main.py migrate)
+    def init_db(self, load_caches: bool = True) -> bool:
 
-        # i have thought about having two connections, but there are a few cross database queries that need to be run
-        # i guess another solution can be retrieving 2 tables using pd and operating on them using pd
+        # the main connection does all the writes to srs.db
+        # the dictionary stays its main database (read-only) so cross database queries keep working here too,
+        # but dictionary scans go through the reader pool instead (see reader_pool.py)
         try:
-            self.conn = sqlite3.connect(self.path_to_full_db)
-            self.conn.execute("PRAGMA journal_mode = WAL")
+            # the connection is driven from the async facade's db thread, not the thread that opened it
+            self.conn = sqlite3.connect(sqlite_uri(self.path_to_full_db, mode = "ro", immutable = 1), uri = True, check_same_thread = False)
             self.conn.execute("PRAGMA busy_timeout = 30000")
 
         except sqlite3.Error as e:
@@ -91,44 +254,280 @@ class SrsApp:
             return False
 
         self.cursor = self.conn.cursor()
-        self.cursor.execute(f"ATTACH DATABASE '{self.path_to_srs_db}' AS {self.id_srs_db};")
+        self.cursor.execute(f"ATTACH DATABASE ? AS {self.id_srs_db};", (sqlite_uri(self.path_to_srs_db, mode = "rwc"),))
+
+        # wal, so the readers can scan srs.db while reviews are being written
+        self.conn.execute(f"PRAGMA {self.id_srs_db}.journal_mode = WAL")
+
+        self.readers = ReaderPool(
+            self.path_to_full_db,
+            self.path_to_srs_db,
+            self.id_srs_db,
+            size = self.dictionary_readers,
+            mmap_size = self.dictionary_mmap_size,
+        )
+
+        if self.dictionary_in_memory:
+            load_time, size = self.readers.load_into_memory()
+            print(f"Loaded the dictionary into memory in {load_time:.2f}s ({size / 1024 / 1024:.1f} MiB).")
+
+        self.load_srs_interval()
+        self.ensure_session_table()
+        self.ensure_due_epoch_column()
+        self.ensure_indexes()
+
+        if load_caches:
+            self.rebuild_stats_cache()
+            self.rebuild_meaning_index()
+
+            # /lookup just finds nothing without it, no reason to keep the bot from starting
+            try:
+                build_time = self.lookup_index.ensure()
+
+                if build_time is not None:
+                    print(f"Built the dictionary lookup index in {build_time:.2f}s.")
+
+            except sqlite3.Error as e:
+                print(f"Lookup index not built: {e}")
 
         return True
 
+    # mirror config.toml's srs_interval into a per-connection lookup table
+    # grade -> seconds until the next review, NULL if the item should stop being reviewed
+    @check_conn
+    def load_srs_interval(self) -> None:
+        unit_seconds = {
+            "hours": 60 * 60,
+            "days": 60 * 60 * 24,
+        }
+
+        rows = []
+
+        for grade, interval in self.srs_interval.items():
+            seconds = None
+
+            if interval["value"] != -1:
+                seconds = interval["value"] * unit_seconds[interval["unit"]]
+
+            rows.append((int(grade), seconds))
+
+        self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {self.name_interval_table.split('.')[-1]} (Grade INTEGER PRIMARY KEY, Seconds INTEGER);")
+        self.conn.execute(f"DELETE FROM {self.name_interval_table};")
+        self.conn.executemany(f"INSERT INTO {self.name_interval_table} (Grade, Seconds) VALUES (?, ?);", rows)
+        self.conn.commit()
+
+        return None
+
+    # where review sessions are snapshotted, see save_session
+    @check_conn
+    def ensure_session_table(self) -> None:
+        self.conn.execute(f"""
+                          CREATE TABLE IF NOT EXISTS {self.name_session_table} (
+                              SessionKey TEXT PRIMARY KEY,
+                              Snapshot TEXT NOT NULL,
+                              UpdatedISO TEXT
+                          );
+                          """)
+        self.conn.commit()
+
+        return None
+
+    # checkpoints of the one-off migrations, see convert_from_houhou
+    # name -> last rowid done, whether it ran to the end
+    @check_conn
+    def ensure_migration_table(self) -> None:
+        self.conn.execute(f"""
+                          CREATE TABLE IF NOT EXISTS {self.name_migration_table} (
+                              Name TEXT PRIMARY KEY,
+                              LastRowid INTEGER NOT NULL,
+                              Finished INTEGER NOT NULL DEFAULT 0
+                          );
+                          """)
+        self.conn.commit()
+
+        return None
+
+    # next due date as an integer unix epoch next to the iso text, so due checks are integer range scans
+    # backfilled from the iso column the first time, after that every write keeps both in sync
+    @check_conn
+    def ensure_due_epoch_column(self) -> bool:
+        table_name = self.name_srs_table.split(".")[-1]
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA {self.id_srs_db}.table_info({table_name});")}
+
+        # the iso column only shows up after convert_from_houhou
+        if self.col_dict["date_col"] not in columns:
+            return False
+
+        q_backfill = f"""
+                     UPDATE {self.name_srs_table}
+                     SET {self.col_dict["due_epoch_col"]} = CAST(strftime('%s', {self.col_dict["date_col"]}) AS INTEGER)
+                     WHERE {self.col_dict["due_epoch_col"]} IS NULL
+                     AND {self.col_dict["date_col"]} IS NOT NULL;
+                     """
+
+        # a start that died mid-backfill (or an older one that committed the column on its own) left rows behind,
+        # and due queries only look at the epoch, so those items would never come due again
+        if self.col_dict["due_epoch_col"] in columns:
+            n_rows = self.conn.execute(q_backfill).rowcount
+            self.conn.commit()
+
+            if n_rows > 0:
+                print(f"Backfilled {n_rows} missing {self.col_dict['due_epoch_col']} values.")
+
+            return True
+
+        # sqlite3 would commit the alter on its own, the column and its values have to land together
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN;")
+
+        try:
+            self.conn.execute(f"ALTER TABLE {self.name_srs_table} ADD COLUMN {self.col_dict['due_epoch_col']} INTEGER;")
+            self.conn.execute(q_backfill)
+            self.conn.commit()
+
+        except Exception:
+            self.conn.rollback()
+
+            raise
+
+        print(f"Added and backfilled {self.col_dict['due_epoch_col']}.")
+
+        return True
+
+    # create any missing index on the srs table, then check that all of them exist
+    # safe to run on every startup, returns the names of the indexes it created
+    @check_conn
+    def ensure_indexes(self) -> list[str]:
+        table_name = self.name_srs_table.split(".")[-1]
+
+        table_info = self.conn.execute(f"PRAGMA {self.id_srs_db}.table_info({table_name});").fetchall()
+
+        # nothing to index until houhou's table is there
+        if not table_info:
+            return []
+
+        columns = {row[1] for row in table_info}
+        primary_keys = [row[1] for row in table_info if row[5]]
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA {self.id_srs_db}.index_list({table_name});")}
+
+        indexes = dict(self.srs_indexes)
+
+        # ID lookups are free if it is the rowid, otherwise it needs its own index
+        if primary_keys != [self.col_dict["id_col"]]:
+            indexes["idx_srs_id"] = (self.col_dict["id_col"], None)
+
+        created = []
+        skipped = []
+
+        for name_index in self.obsolete_srs_indexes:
+            if name_index in existing:
+                self.conn.execute(f"DROP INDEX IF EXISTS {self.id_srs_db}.{name_index};")
+
+        for name_index, (name_col, condition) in indexes.items():
+
+            # the iso columns only show up after convert_from_houhou
+            if name_col not in columns:
+                skipped.append(name_index)
+
+                continue
+
+            if name_index in existing:
+                continue
+
+            q = f"CREATE INDEX IF NOT EXISTS {self.id_srs_db}.{name_index} ON {table_name} ({name_col})"
+
+            if condition:
+                q += f" WHERE {condition}"
+
+            self.conn.execute(q + ";")
+            created.append(name_index)
+
+        self.conn.commit()
+
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA {self.id_srs_db}.index_list({table_name});")}
+        missing = [name_index for name_index in indexes if name_index not in existing and name_index not in skipped]
+
+        if missing:
+            raise Exception(f"Indexes missing after creation: {missing}")
+
+        if created:
+            print(f"Created indexes: {', '.join(created)}")
+
+        if skipped:
+            print(f"Skipped indexes (columns not found, run convert_from_houhou): {', '.join(skipped)}")
+
+        return created
+
+    # lightweight row access for the hot path
+    # rows come back as plain dicts through sqlite3.Row, pandas is only used for analytics
+    @check_conn
+    @metrics.timed("db.read")
+    def fetch_rows(self, q: str, params: tuple = ()) -> list[dict]:
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        rows = cursor.execute(q, params).fetchall()
+
+        return [dict(row) for row in rows]
+
     # buffer for committing
     # prevents many commits at the same time
+    # writes stay in the open transaction until there are entries_before_commit of them,
+    # or until the background flusher sees the oldest one waited max_commit_latency seconds
     @check_conn
     def to_commit(self) -> None:
         self.entries_without_commit += 1
 
+        if self.first_uncommitted_time is None:
+            self.first_uncommitted_time = time.monotonic()
+
         if self.entries_without_commit >= self.entries_before_commit:
-            self.conn.commit()
-            self.entries_without_commit = 0
+            self.force_commit()
 
         return None
 
     # reset # of entries without commit, and then commit
     @check_conn
+    @metrics.timed("db.commit")
     def force_commit(self) -> None:
         self.entries_without_commit = 0
+        self.first_uncommitted_time = None
+        self.write_session_snapshots()
         self.conn.commit()
 
         return None
 
+    # true once the oldest uncommitted write has waited long enough
+    def commit_overdue(self) -> bool:
+        first_uncommitted_time = self.first_uncommitted_time
+
+        if first_uncommitted_time is None:
+            return False
+
+        return time.monotonic() - first_uncommitted_time >= self.max_commit_latency
+
     # close db by commiting all changes then closing the connection
     @check_conn
     def close_db(self) -> None:
         self.force_commit()
         self.conn.close()
 
+        if self.readers is not None:
+            self.readers.close()
+
+        self.lookup_index.close()
+
         self.conn = None
         self.cursor = None
+        self.readers = None
 
         return None
 
     # retrieve counts and ratio from db
     @check_conn
-    def get_review_stats(self) -> tuple[DataFrame, DataFrame, DataFrame]:
+    def get_review_stats(self) -> tuple["DataFrame", "DataFrame", "DataFrame"]:
+        import pandas as pd
+
         max_srs_grade = max(int(x) for x in self.srs_interval.keys())
 
         expected_values = "\n".join([f"SELECT {i} UNION ALL" for i in range(max_srs_grade)])
@@ -146,10 +545,10 @@ class SrsApp:
                                 ORDER BY expected.val;
                                 """
 
-        # get the end of day today, but in utc! (items are stored using now -> utc time)
+        # end of day today in local time, as an epoch (so a plain integer range on the due index)
         q_today_review_count = f"""
                                SELECT COUNT(*) FROM {self.name_srs_table}
-                               WHERE {self.col_dict["date_col"]} < datetime('now', 'localtime', 'start of day', '+1 day', '-1 second', 'utc');
+                               WHERE {self.col_dict["due_epoch_col"]} < ?;
                                """
 
         q_sucess_ratio = f"""
@@ -162,39 +561,167 @@ class SrsApp:
                          """
 
         df_grade_counts = pd.read_sql_query(q_current_grade_count, self.conn)
-        df_today_counts = pd.read_sql_query(q_today_review_count, self.conn)
+        df_today_counts = pd.read_sql_query(q_today_review_count, self.conn, params = (int(end_of_local_day().timestamp()),))
         df_ratio = pd.read_sql_query(q_sucess_ratio, self.conn)
 
         return df_grade_counts, df_today_counts, df_ratio
 
-    # returns info on current item
+    # reload the stats cache from the db
+    # only needed on startup, after a conversion, or when a consistency check fails
+    @check_conn
+    def rebuild_stats_cache(self) -> None:
+        q = f"""
+            SELECT
+                {self.col_dict["id_col"]},
+                {self.col_dict["current_grade_col"]},
+                {self.col_dict["success_col"]},
+                {self.col_dict["failure_col"]},
+                {self.col_dict["due_epoch_col"]}
+            FROM {self.name_srs_table};
+            """
+
+        # the iso columns only show up after convert_from_houhou
+        try:
+            rows = self.conn.execute(q).fetchall()
+
+        except sqlite3.OperationalError as e:
+            print(f"Stats cache not built: {e}")
+            self.stats_cache.reset()
+
+            return None
+
+        self.stats_cache.rebuild(rows)
+
+        return None
+
+    # compare the cache against the db, rebuilding it if anything drifted
+    # returns whether the cache was consistent
+    @check_conn
+    def check_stats_cache(self) -> bool:
+        if not self.stats_cache.valid:
+            self.rebuild_stats_cache()
+
+            return False
+
+        q = f"""
+            SELECT
+                SUM({self.col_dict["success_col"]}),
+                SUM({self.col_dict["failure_col"]}),
+                SUM({self.col_dict["due_epoch_col"]} < :now)
+            FROM {self.name_srs_table};
+            """
+        q_grades = f"""
+                   SELECT {self.col_dict["current_grade_col"]}, COUNT(*) FROM {self.name_srs_table}
+                   GROUP BY {self.col_dict["current_grade_col"]};
+                   """
+
+        success_count, failure_count, due_now = self.conn.execute(q, {"now": int(time.time())}).fetchone()
+        grade_counts = {grade: count for grade, count in self.conn.execute(q_grades)}
+
+        cache = self.stats_cache
+        cache_grade_counts = {grade: count for grade, count in cache.grade_counts.items() if count}
+
+        is_consistent = (
+            (success_count or 0) == cache.success_count
+            and (failure_count or 0) == cache.failure_count
+            and (due_now or 0) == cache.summary()["due_now"]
+            and grade_counts == cache_grade_counts
+        )
+
+        if not is_consistent:
+            print("Stats cache drifted from the db, rebuilding.")
+            self.rebuild_stats_cache()
+
+        return is_consistent
+
+    # reload every item's meanings into the deck-wide meaning index
     @check_conn
-    def get_current_item(self) -> dict:
-        if len(self.current_reviews) == 0:
+    def rebuild_meaning_index(self) -> None:
+        q = f"""
+            SELECT
+                {self.col_dict["id_col"]},
+                COALESCE({self.col_dict["kanji_col"]}, {self.col_dict["vocab_col"]}),
+                Meanings
+            FROM {self.name_srs_table};
+            """
+
+        try:
+            rows = self.conn.execute(q).fetchall()
+
+        except sqlite3.OperationalError as e:
+            print(f"Meaning index not built: {e}")
+            self.meaning_index.reset()
+
             return None
 
-        if self.current_index >= len(self.current_reviews):
-            self.current_index = 0
+        self.meaning_index.rebuild(
+            (item_id, prompt, build_answer_index("meaning", meanings or "")[1])
+            for item_id, prompt, meanings in rows
+        )
+
+        return None
+
+    # which other item a wrong meaning answer belongs to, if any
+    # returns (prompt, matched meaning, score) or None
+    @check_conn
+    @metrics.timed("answer.confusion")
+    def find_confused_meaning(self, answer: str, item_id: int) -> tuple:
+        if not self.meaning_index.valid:
+            self.rebuild_meaning_index()
+
+        return self.meaning_index.lookup(answer, exclude_id = item_id)
+
+    # dictionary search for /lookup, see lookup_index.py
+    @check_conn
+    def lookup(self, query: str, limit: int = 10) -> list[dict]:
+        return self.lookup_index.search(query, limit)
 
-        return self.current_reviews[self.current_index]
+    # grade histogram, due now/today and success ratio, straight from the cache
+    @check_conn
+    def get_stats(self) -> dict:
+        if not self.stats_cache.valid:
+            self.rebuild_stats_cache()
+
+        return self.stats_cache.summary()
+
+    # returns info on current item
+    @check_conn
+    def get_current_item(self, session: ReviewSession) -> Card:
+        return session.front()
 
-    # returns df on review items that have their next review date timestamp less than the current time
+    # returns the ids of due items, sorted latest due first so popping from the end gives the earliest ones
+    # id is the rowid, so this is answered from the due index alone
+    @check_conn
+    @metrics.timed("db.due_ids")
+    def get_due_review_ids(self) -> list[int]:
+        q = f"""
+            SELECT {self.col_dict["id_col"]} FROM {self.name_srs_table}
+            WHERE {self.col_dict["due_epoch_col"]} < ?
+            ORDER BY {self.col_dict["due_epoch_col"]} DESC;
+            """
+
+        return [row[0] for row in self.conn.execute(q, (int(time.time()),))]
+
+    # returns rows of review items that have their next review date timestamp less than the current time
     # that means that item is ready for review
+    # sorted latest due first, so popping from the end gives the earliest ones
     @check_conn
-    def get_due_reviews(self) -> DataFrame:
+    def get_due_reviews(self) -> list[dict]:
 
-        # this will get all items that have their reviews BEFORE the current time in **UTC**
+        # this will get all items that have their reviews BEFORE the current time (epochs are utc)
         q = f"""
             SELECT * FROM {self.name_srs_table}
-            WHERE {self.col_dict["date_col"]} < current_timestamp;
+            WHERE {self.col_dict["due_epoch_col"]} < ?
+            ORDER BY {self.col_dict["due_epoch_col"]} DESC;
             """
 
-        df = pd.read_sql_query(q, self.conn)
-        return df
+        return self.fetch_rows(q, (int(time.time()),))
 
     # returns df of all vocabs present in the user's srs review
     @check_conn
     def get_study_vocab(self) -> set:
+        import pandas as pd
+
         q = f"""
             SELECT {self.col_dict["vocab_col"]} FROM {self.name_srs_table};
             """
@@ -210,6 +737,8 @@ class SrsApp:
     # i should also blacklist all the hiragana and katakana, but it is what it is
     @check_conn
     def get_study_kanji(self) -> set:
+        import pandas as pd
+
         q = f"""
             SELECT {self.col_dict["vocab_col"]}, {self.col_dict["kanji_col"]} FROM {self.name_srs_table}
             WHERE LENGTH({self.col_dict["vocab_col"]}) = 1
@@ -226,7 +755,9 @@ class SrsApp:
         return all_kanjis
 
     @check_conn
-    def filter_study_items(self, item_type: str, condition: str = "1=1") -> DataFrame:
+    def filter_study_items(self, item_type: str, condition: str = "1=1") -> "DataFrame":
+        import pandas as pd
+
         match item_type:
             case "vocab":
                 item_col = self.col_dict["vocab_col"]
@@ -246,142 +777,219 @@ class SrsApp:
         df = pd.read_sql_query(q, self.conn)
         return df
 
-    # returns df of vocab that isn't present in our reviews given conditions
-    # sort after using pd.sort_values to put nans at the end
+    # discovery of dictionary items that aren't in our reviews yet, a page at a time
+    # pages are keyset paginated on the dictionary id (id > after_id), so every page is a short indexed scan
+    # and only one page of joined rows is ever in memory, however big the dictionary is
+    # each page borrows a pooled reader, so it only sees committed reviews
+    #
+    # returns (items, after_id for the next page), the latter is None once the dictionary is exhausted
+    # vocab items: {"id", "writing", "reading", "jlpt", "meanings", "categories"}
     @check_conn
-    def discover_new_vocab(self, condition: str = "v.JlptLevel IN (1, 2, 3, 4, 5)") -> DataFrame:
+    def discover_vocab_page(self, condition: str = "v.JlptLevel IN (1, 2, 3, 4, 5)", after_id: int = 0, page_size: int = 25) -> tuple[list[dict], int]:
         q = f"""
-            WITH v_except AS (
-                SELECT * FROM VocabSet AS v
+            WITH v_page AS (
+                SELECT v.ID, COALESCE(v.KanjiWriting, v.KanaWriting) AS Writing, v.KanaWriting, v.JlptLevel FROM VocabSet AS v
                 WHERE {condition}
+                AND v.ID > ?
                 AND NOT EXISTS (
                     SELECT 1 FROM {self.name_srs_table} AS srs
-                    WHERE srs.{self.col_dict["vocab_col"]} = v.KanjiWriting
+                    WHERE srs.{self.col_dict["vocab_col"]} = COALESCE(v.KanjiWriting, v.KanaWriting)
                     )
+                ORDER BY v.ID
+                LIMIT ?
                 )
-            SELECT * FROM v_except
-            JOIN VocabEntityVocabMeaning AS v_link ON v_link.VocabEntity_ID = v_except.ID
-            JOIN VocabMeaningSet AS v_meaning ON v_link.Meanings_ID = v_meaning.ID
-            JOIN VocabMeaningVocabCategory as v_cat_link ON v_cat_link.VocabMeaningVocabCategory_VocabCategory_ID = v_meaning.ID
-            JOIN VocabCategorySet as v_cat ON v_cat.ID = v_cat_link.Categories_ID;
+            SELECT v_page.ID, v_page.Writing, v_page.KanaWriting, v_page.JlptLevel, v_meaning.Meaning, v_cat.Label FROM v_page
+            LEFT JOIN VocabEntityVocabMeaning AS v_link ON v_link.VocabEntity_ID = v_page.ID
+            LEFT JOIN VocabMeaningSet AS v_meaning ON v_link.Meanings_ID = v_meaning.ID
+            LEFT JOIN VocabMeaningVocabCategory as v_cat_link ON v_cat_link.VocabMeaningVocabCategory_VocabCategory_ID = v_meaning.ID
+            LEFT JOIN VocabCategorySet as v_cat ON v_cat.ID = v_cat_link.Categories_ID
+            ORDER BY v_page.ID, v_meaning.ID;
             """
 
-        df = pd.read_sql_query(q, self.conn)
-        return df
+        items = dict()
+
+        with self.readers.connection() as conn:
+            for item_id, writing, reading, jlpt, meaning, category in conn.execute(q, (after_id, page_size)):
+                item = items.get(item_id)
+
+                if item is None:
+                    item = {"id": item_id, "writing": writing, "reading": reading, "jlpt": jlpt, "meanings": [], "categories": []}
+                    items[item_id] = item
+
+                # a meaning shows up once per category, a category once per meaning
+                if meaning is not None and meaning not in item["meanings"]:
+                    item["meanings"].append(meaning)
 
-    # returns df of kanji that isn't present in our reviews given conditions
-    # sort after using pd.sort_values to put nans at the end
+                if category is not None and category not in item["categories"]:
+                    item["categories"].append(category)
+
+        return self._discovered_page(items, page_size)
+
+    # same, kanji items: {"id", "writing", "readings", "jlpt", "meanings"}
     @check_conn
-    def discover_new_kanji(self, condition: str = "k.JpltLevel IN (1, 2, 3, 4, 5)") -> DataFrame:
+    def discover_kanji_page(self, condition: str = "k.JlptLevel IN (1, 2, 3, 4, 5)", after_id: int = 0, page_size: int = 25) -> tuple[list[dict], int]:
         q = f"""
-            WITH k_except AS (
-                SELECT * FROM KanjiSet AS k
+            WITH k_page AS (
+                SELECT k.ID, k.Character, k.OnYomi, k.KunYomi, k.JlptLevel FROM KanjiSet AS k
                 WHERE {condition}
+                AND k.ID > ?
                 AND NOT EXISTS (
                     SELECT 1 FROM {self.name_srs_table} AS srs
                     WHERE srs.{self.col_dict["kanji_col"]} = k.Character
                     )
+                ORDER BY k.ID
+                LIMIT ?
                 )
-            SELECT * FROM k_except as k
-            JOIN KanjiMeaningSet AS k_meanings ON k_meanings.Kanji_ID = k.ID;
+            SELECT k_page.ID, k_page.Character, k_page.OnYomi, k_page.KunYomi, k_page.JlptLevel, k_meanings.Meaning FROM k_page
+            LEFT JOIN KanjiMeaningSet AS k_meanings ON k_meanings.Kanji_ID = k_page.ID
+            ORDER BY k_page.ID, k_meanings.ID;
             """
 
-        df = pd.read_sql_query(q, self.conn)
-        return df
+        items = dict()
+
+        with self.readers.connection() as conn:
+            for item_id, character, on_yomi, kun_yomi, jlpt, meaning in conn.execute(q, (after_id, page_size)):
+                item = items.get(item_id)
+
+                if item is None:
+                    readings = [reading for reading in (on_yomi, kun_yomi) if reading]
+                    item = {"id": item_id, "writing": character, "readings": ",".join(readings), "jlpt": jlpt, "meanings": []}
+                    items[item_id] = item
+
+                if meaning is not None:
+                    item["meanings"].append(meaning)
+
+        return self._discovered_page(items, page_size)
+
+    # the next page starts after the last id scanned, even if that item had no meanings and is left out
+    def _discovered_page(self, items: dict, page_size: int) -> tuple[list[dict], int]:
+        after_id = max(items) if len(items) == page_size else None
+
+        return [item for item in items.values() if item["meanings"]], after_id
+
+    # every undiscovered item, page by page, for callers that want to stream the whole thing
+    def iter_new_items(self, item_type: str, condition: str = None, page_size: int = 500):
+        match item_type:
+            case "vocab":
+                discover_page = self.discover_vocab_page
+
+            case "kanji":
+                discover_page = self.discover_kanji_page
+
+            case _:
+                raise Exception(f"Unknown item type: {item_type}")
+
+        kwargs = {"condition": condition} if condition else {}
+        after_id = 0
+
+        while after_id is not None:
+            items, after_id = discover_page(after_id = after_id, page_size = page_size, **kwargs)
+
+            yield from items
 
     # initialize the review session
+    # only the due ids are loaded up front, full rows are hydrated in chunks as the session needs them
     @check_conn
-    def start_review_session(self) -> list:
-        self.reset_review_variables()
+    @metrics.timed("db.start_review_session")
+    def start_review_session(self, session: ReviewSession) -> list:
+        session.reset()
 
-        # get due reviews
-        df = self.get_due_reviews()
+        session.due_review_ids = self.get_due_review_ids()
+        session.len_review_ids = len(session.due_review_ids)
 
-        if df.empty:
+        if not session.due_review_ids:
             return []
 
-        # sort them by when they were due, so the user can complete the earliest ones first
-        sorted_df = df.sort_values(self.col_dict["date_col"], ascending = False)
-        self.due_review_ids = sorted_df["ID"].tolist()
-        self.len_review_ids = len(self.due_review_ids)
-
-        current_ids = set()
-
         # makes sure that we add as many items to the review list without exceeding the max reviews defined
-        while len(current_ids) < len(sorted_df) and len(current_ids) < self.max_reviews_at_once:
-            current_id = self.due_review_ids.pop()
-            current_ids.add(current_id)
-
-        current_df = sorted_df[sorted_df["ID"].isin(current_ids)]
-        items = current_df.to_dict("records")
-        self.add_to_review(items)
+        items = self.hydrate_review_items(session)
+        self.add_to_review(session, items)
 
-        return self.current_reviews
+        return list(session.queue)
 
     # if the user has not designated to stop reviewing, get another item and add it to the review list
     @check_conn
-    def update_review_session(self) -> None:
+    @metrics.timed("db.update_review_session")
+    def update_review_session(self, session: ReviewSession) -> None:
 
         # stop we have already added all review items into our list, so we can stop updating review
-        if len(self.due_review_ids) == 0:
-            self.stop_updating_review = True
-
-        if not self.stop_updating_review:
-
-            # adds one id
-            current_id = self.due_review_ids.pop()
-            q = f"""
-                SELECT * FROM {self.name_srs_table}
-                WHERE {self.col_dict["id_col"]} = {current_id};
-                """
- 
-            df = pd.read_sql_query(q, self.conn)
-            item = df.to_dict("records")
-            self.add_to_review(item)
+        if len(session.due_review_ids) == 0 and len(session.prefetched_reviews) == 0:
+            session.stop_updating_review = True
+
+        if not session.stop_updating_review:
+
+            # refill the prefetch buffer a whole chunk at a time
+            # a chunk whose items were all deleted in the meantime comes back empty, so go on to the next one
+            while len(session.prefetched_reviews) == 0 and len(session.due_review_ids) > 0:
+                session.prefetched_reviews = self.hydrate_review_items(session)[::-1]
+
+            if len(session.prefetched_reviews) == 0:
+                session.stop_updating_review = True
+
+                return None
+
+            # adds one item
+            item = session.prefetched_reviews.pop()
+            self.add_to_review(session, [item])
 
         return None
 
-    # defines an item and adds it to the review list
+    # pops the next chunk of due ids (earliest first) and returns their full rows in the same order
+    @check_conn
+    @metrics.timed("db.hydrate")
+    def hydrate_review_items(self, session: ReviewSession) -> list[dict]:
+        n_items = min(self.max_reviews_at_once, len(session.due_review_ids))
+
+        if n_items == 0:
+            return []
+
+        chunk_ids = session.due_review_ids[-n_items:][::-1]
+        del session.due_review_ids[-n_items:]
+
+        q = f"""
+            SELECT * FROM {self.name_srs_table}
+            WHERE {self.col_dict["id_col"]} IN ({", ".join("?" * len(chunk_ids))});
+            """
+
+        rows_by_id = {row[self.col_dict["id_col"]]: self.share_row(row) for row in self.fetch_rows(q, tuple(chunk_ids))}
+
+        # items deleted since the session started are just skipped
+        return [rows_by_id[item_id] for item_id in chunk_ids if item_id in rows_by_id]
+
+    # the row already shared for this item, brought up to date with a fresh read, or this one if there is none
+    # updated in place, so the cards already holding it see the fresh values too
+    def share_row(self, row: dict) -> ItemRow:
+        item_id = row[self.col_dict["id_col"]]
+        shared = self.rows.get(item_id)
+
+        if shared is None:
+            shared = ItemRow(row)
+            self.rows[item_id] = shared
+
+        else:
+            shared.update(row)
+
+        return shared
+
+    # one card of an item, its reading or its meaning
+    def make_card(self, item: ItemRow, card_type: str) -> Card:
+        return Card(item, card_type)
+
+    # defines an item and adds its cards to the review queue
     @check_conn
-    def add_to_review(self, items: list) -> None:
+    def add_to_review(self, session: ReviewSession, items: list) -> None:
+
+        # we need to make two cards: reading and meaning
+        # they share the row, and go in at random places instead of reshuffling the whole queue
         for item in items:
-            review_type = None
-            current_item = None
-
-            kanji_item = item.get(self.col_dict["kanji_col"])
-            vocab_item = item.get(self.col_dict["vocab_col"])
-
-            if kanji_item:
-                review_type = "kanji"
-                current_item = kanji_item
-
-            elif vocab_item:
-                review_type = "vocab"
-                current_item = vocab_item
-
-            # we need to make two cards: reading and meaning
-            # they are defined as such
-            reading_card = item.copy()
-            reading_card["review_type"] = review_type
-            reading_card["card_type"] = "reading"
-            reading_card["prompt"] = current_item
-            reading_card["expected_answer"] = reading_card["Readings"]
-            self.current_reviews.append(reading_card)
-
-            meaning_card = item.copy()
-            meaning_card["review_type"] = review_type
-            meaning_card["card_type"] = "meaning"
-            meaning_card["prompt"] = current_item
-            meaning_card["expected_answer"] = meaning_card["Meanings"]
-            self.current_reviews.append(meaning_card)
-
-        random.shuffle(self.current_reviews)
+            session.insert_randomly(self.make_card(item, "reading"))
+            session.insert_randomly(self.make_card(item, "meaning"))
 
         return None
 
     # adds another valid meaning to the item in the db
     @check_conn
-    def add_valid_response(self, user_input: str, item: dict) -> None:
+    @metrics.timed("db.add_valid_response")
+    def add_valid_response(self, user_input: str, item: dict) -> tuple[str, str]:
         card_type = item["card_type"]
         item_id = item["ID"]
 
@@ -396,23 +1004,39 @@ class SrsApp:
             UPDATE {self.name_srs_table}
             SET
                 {response_col} = ?
-            WHERE {self.col_dict["id_col"]} = {item_id};
+            WHERE {self.col_dict["id_col"]} = ?;
             """
 
         valid_responses = item[response_col]
         valid_responses += f",{user_input}"
 
-        self.conn.execute(q, (valid_responses,))
+        self.conn.execute(q, (valid_responses, item_id))
         self.to_commit()
 
+        if response_col == "Meanings":
+            self.meaning_index.set_item(item_id, None, build_answer_index("meaning", valid_responses)[1])
+
+        # the queued cards are refreshed by the caller, see AsyncSrsApp.add_valid_response
+        return response_col, valid_responses
+
+    # every card of an item shares one row, and rebuilds its answer index when the row's responses change,
+    # so only that row needs the new responses, no session's queue is gone through
+    # runs on the event loop, where the cards are answered
+    def refresh_valid_responses(self, item_id: int, response_col: str, valid_responses: str) -> None:
+        row = self.rows.get(item_id)
+
+        if row is not None:
+            row[response_col] = valid_responses
+
         return None
 
     # adds an item from the vocab/kanji db to the srs review db
     @check_conn
+    @metrics.timed("db.add_review_item")
     def add_review_item(self, item: dict) -> None:
         q = f"""
-            INSERT INTO {self.name_srs_table} (Meanings, Readings, CurrentGrade, FailureCount, SuccessCount, AssociatedVocab, AssociatedKanji, MeaningNote, ReadingNote, Tags, IsDeleted, LastUpdateDateISO, CreationDateISO, NextAnswerDateISO)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            INSERT INTO {self.name_srs_table} (Meanings, Readings, CurrentGrade, FailureCount, SuccessCount, AssociatedVocab, AssociatedKanji, MeaningNote, ReadingNote, Tags, IsDeleted, LastUpdateDateISO, CreationDateISO, NextAnswerDateISO, NextAnswerEpoch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """
 
         # utc current timestamp
@@ -435,6 +1059,7 @@ class SrsApp:
         last_update_date = current_datetime.strftime("%Y-%m-%d %H:%M:%S")
         creation_date = current_datetime.strftime("%Y-%m-%d %H:%M:%S")
         next_answer_date = next_answer_datetime.strftime("%Y-%m-%d %H:%M:%S")
+        next_answer_epoch = int(next_answer_datetime.timestamp())
 
         match item["type"]:
             case "vocab":
@@ -444,76 +1069,148 @@ class SrsApp:
                 associated_kanji = item["kanji"].value
 
         # big tuple...
-        self.conn.execute(q, (meanings, readings, current_grade, failure_count, success_count, associated_vocab, associated_kanji, meaning_notes, reading_notes, tags, is_deleted, last_update_date, creation_date, next_answer_date))
-        self.conn.commit()
+        cursor = self.conn.execute(q, (meanings, readings, current_grade, failure_count, success_count, associated_vocab, associated_kanji, meaning_notes, reading_notes, tags, is_deleted, last_update_date, creation_date, next_answer_date, next_answer_epoch))
+        self.force_commit()
+
+        self.stats_cache.set_item(cursor.lastrowid, current_grade, next_answer_epoch)
+        self.meaning_index.set_item(cursor.lastrowid, associated_kanji or associated_vocab, build_answer_index("meaning", meanings)[1])
 
         return None
 
-    # after an answer has been processed, edit the item's status in the db
+    # adds every item of a jlpt level that isn't in the deck yet, e.g. all unstudied N4 kanji
+    # items are streamed page by page off discovery (see iter_new_items) straight into one executemany,
+    # so it's one transaction (one fsync) in total
+    # the first reviews are staggered stagger_seconds apart, so they don't all come due at once
+    # returns how many were added, how long it took and the throughput
     @check_conn
-    def update_review_item(self, item_id: str, res: bool) -> None:
-        q_retrieve_item = f"""
-                          SELECT 
-                              CurrentGrade,
-                              FailureCount,
-                              SuccessCount
-                          FROM {self.name_srs_table}
-                          WHERE {self.col_dict["id_col"]} = {item_id};
-                          """
-        q_update_item = f"""
-                        UPDATE {self.name_srs_table}
-                        SET
-                            CurrentGrade = ?,
-                            FailureCount = ?,
-                            SuccessCount = ?,
-                            LastUpdateDateISO = current_timestamp,
-                            NextAnswerDateISO = ?
-                        WHERE {self.col_dict["id_col"]} = {item_id};
-                        """
+    @metrics.timed("db.add_review_items_bulk")
+    def add_review_items_bulk(self, item_type: str, jlpt_level: int, stagger_seconds: int = 0, limit: int = None) -> dict:
+        q_insert = f"""
+                   INSERT INTO {self.name_srs_table} (Meanings, Readings, CurrentGrade, FailureCount, SuccessCount, AssociatedVocab, AssociatedKanji, MeaningNote, ReadingNote, Tags, IsDeleted, LastUpdateDateISO, CreationDateISO, NextAnswerDateISO, NextAnswerEpoch)
+                   VALUES (?, ?, 0, 0, 0, ?, ?, NULL, NULL, NULL, 0, ?, ?, ?, ?);
+                   """
 
-        df = pd.read_sql_query(q_retrieve_item, self.conn)
-        row = df.to_dict("records")[0]
+        # the jlpt level is the only condition, so it can go straight into the discovery query
+        condition = f"{item_type[0]}.JlptLevel = {int(jlpt_level)}"
 
-        # utc current timestamp
-        current_time = datetime.now(timezone.utc)
+        interval = self.conn.execute(f"SELECT Seconds FROM {self.name_interval_table} WHERE Grade = 0;").fetchone()
+        first_review = interval[0] if interval and interval[0] is not None else 0
 
-        # if the user got the item correct, increase the grade and success count
-        # otherwise, opposite
-        if res:
-            row["CurrentGrade"] += 1
-            row["SuccessCount"] += 1
+        # discovery only sees committed rows, so nothing of ours may be waiting in the open transaction
+        self.force_commit()
 
-        else:
-            row["CurrentGrade"] = max(0, row["CurrentGrade"] - 1)
-            row["FailureCount"] += 1
+        start = time.perf_counter()
+        now = int(time.time())
+        current_date = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        n_inserted = 0
 
-        current_grade_key = str(row["CurrentGrade"])
-        current_grade_dict = self.srs_interval[current_grade_key]
+        def rows(items):
+            nonlocal n_inserted
 
-        # if -1, then the user has proved that they know this item well enough to stop reviewing
-        # otherwise, use the toml to determine when the next review date is
-        match current_grade_dict["value"]:
-            case -1:
-                review_time = None
+            # houhou's dictionary has some writings more than once (one row per reading)
+            seen = set()
 
-            case _:
-                match current_grade_dict["unit"]:
-                    case "hours":
-                        review_datetime = current_time + timedelta(hours = current_grade_dict["value"])
+            for item in items:
+                writing = item["writing"]
+                readings = item["reading"] if item_type == "vocab" else item["readings"]
+
+                if limit is not None and n_inserted >= limit:
+                    return None
+
+                if writing in seen or not readings:
+                    continue
+
+                seen.add(writing)
+
+                next_answer_epoch = now + first_review + n_inserted * stagger_seconds
+                next_answer_date = datetime.fromtimestamp(next_answer_epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+                associated_vocab = writing if item_type == "vocab" else None
+                associated_kanji = writing if item_type == "kanji" else None
+
+                n_inserted += 1
+
+                # joined the way the deck stores them
+                yield ",".join(item["meanings"]), readings, associated_vocab, associated_kanji, current_date, current_date, next_answer_date, next_answer_epoch
+
+        try:
+            self.conn.executemany(q_insert, rows(self.iter_new_items(item_type, condition)))
+            self.conn.commit()
+
+        except Exception:
+            self.conn.rollback()
 
-                    case "days":
-                        review_datetime = current_time + timedelta(days = current_grade_dict["value"])
+            raise
 
-                review_time = review_datetime.strftime("%Y-%m-%d %H:%M:%S")
+        seconds = time.perf_counter() - start
 
-        self.conn.execute(q_update_item, (row["CurrentGrade"], row["FailureCount"], row["SuccessCount"], review_time))
-        self.current_completed += 1 # increment counter for frontend
+        # executemany doesn't hand back the new ids, so the caches are rebuilt instead of patched
+        if n_inserted:
+            self.rebuild_stats_cache()
+            self.rebuild_meaning_index()
+
+        return {
+            "inserted": n_inserted,
+            "seconds": seconds,
+            "rows_per_second": n_inserted / seconds if seconds else 0.0,
+        }
+
+    # after an answer has been processed, edit the item's status in the db
+    @check_conn
+    @metrics.timed("db.update_review_item")
+    def update_review_item(self, session: ReviewSession, item_id: str, res: bool) -> dict:
+
+        # one statement: the new grade is looked up in the interval table, so success/failure is applied atomically
+        # if the user got the item correct, increase the grade and success count
+        # otherwise, opposite
+        # a grade without an interval (-1 in the toml) means the user knows this item well enough to stop reviewing
+        q_update_item = f"""
+                        UPDATE {self.name_srs_table} AS srs
+                        SET
+                            CurrentGrade = interval.Grade,
+                            FailureCount = srs.FailureCount + 1 - :res,
+                            SuccessCount = srs.SuccessCount + :res,
+                            LastUpdateDateISO = current_timestamp,
+                            NextAnswerDateISO = datetime(:now + interval.Seconds, 'unixepoch'),
+                            NextAnswerEpoch = :now + interval.Seconds
+                        FROM {self.name_interval_table} AS interval
+                        WHERE srs.{self.col_dict["id_col"]} = :item_id
+                        AND interval.Grade = CASE
+                            WHEN :res THEN MIN(srs.CurrentGrade + 1, :max_grade)
+                            ELSE MAX(srs.CurrentGrade - 1, 0)
+                        END
+                        RETURNING CurrentGrade, NextAnswerEpoch;
+                        """
+
+        params = {
+            "now": int(time.time()),
+            "res": int(res),
+            "item_id": item_id,
+            "max_grade": self.max_srs_grade,
+        }
+
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute(q_update_item, params).fetchone()
+
+        session.current_completed += 1 # increment counter for frontend
+
+        # the grade may be committed right below, so the snapshot without this item's card has to go with it,
+        # otherwise a crash would restore the card and grade the item again
+        self.save_session(session)
         self.to_commit()
 
-        return None
+        if row is None:
+            return None
+
+        self.stats_cache.set_item(item_id, row["CurrentGrade"], row["NextAnswerEpoch"])
+        self.stats_cache.add_result(res)
+
+        return dict(row)
 
     # after user edits an item, we should change its respective variables
     @check_conn
+    @metrics.timed("db.edit_review_item")
     def edit_review_item(self, item: dict) -> None:
         q = f"""
             UPDATE {self.name_srs_table}
@@ -526,8 +1223,10 @@ class SrsApp:
                 MeaningNote = ?,
                 ReadingNote = ?,
                 LastUpdateDateISO = current_timestamp,
-                NextAnswerDateISO = ?
-            WHERE {self.col_dict["id_col"]} = {item["item_id"]};
+                NextAnswerDateISO = ?,
+                NextAnswerEpoch = CAST(strftime('%s', ?) AS INTEGER)
+            WHERE {self.col_dict["id_col"]} = ?
+            RETURNING NextAnswerEpoch;
             """
 
         # default definitions
@@ -549,15 +1248,29 @@ class SrsApp:
                 associated_kanji = item["kanji"].value
 
         # big tuple...
-        self.conn.execute(q, (meanings, readings, current_grade, associated_vocab, associated_kanji, meaning_notes, reading_notes, next_answer_date))
-        self.conn.commit()
+        row = self.conn.execute(q, (meanings, readings, current_grade, associated_vocab, associated_kanji, meaning_notes, reading_notes, next_answer_date, next_answer_date, item["item_id"])).fetchone()
+        self.force_commit()
+
+        # nothing to update if the item is gone
+        if row is None:
+            return None
+
+        self.stats_cache.set_item(int(item["item_id"]), int(current_grade), row[0])
+        self.meaning_index.set_item(int(item["item_id"]), associated_kanji or associated_vocab, build_answer_index("meaning", meanings)[1])
 
         return None
 
     # function to convert db from houhou
     # specifically, this just adds similar columns representing time but in iso format for readability
+    # (plus the epoch copy of the next answer date)
+    #
+    # rows are converted in rowid ranges of chunk_size, one short transaction per chunk, so the write lock
+    # is only ever held briefly, and the last converted rowid is checkpointed with each chunk
+    # if it gets interrupted, running it again picks up after the checkpoint
+    # dry_run converts one chunk, times it and rolls it back, to estimate the whole thing
+    # progress(done, total) is called after every chunk
     @check_conn
-    def convert_from_houhou(self) -> None:
+    def convert_from_houhou(self, chunk_size: int = 5000, dry_run: bool = False, progress = None) -> dict:
         names_date_col = [
             self.col_dict["houhou_last_update_col"],
             self.col_dict["houhou_creation_col"],
@@ -565,35 +1278,146 @@ class SrsApp:
             self.col_dict["houhou_suspension_col"],
         ]
 
-        for name_col in names_date_col:
-            name_iso_col = name_col + "ISO"
-            q_create_col = f"ALTER TABLE {self.name_srs_table} ADD COLUMN {name_iso_col} TEXT;"
-            q_update_col = f"""
-                           UPDATE {self.name_srs_table}
-                           SET {name_iso_col} = 
-                               CASE 
-                                   WHEN typeof({name_col}) = 'text' 
-                                   AND {name_col} GLOB '20[0-9][0-9]-*' THEN 
-                                       {name_col}
+        table_name = self.name_srs_table.split(".")[-1]
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA {self.id_srs_db}.table_info({table_name});")}
 
-                                   WHEN typeof({name_col}) = 'integer' THEN
-                                       datetime(({name_col} / 10000000) - 62135596800, 'unixepoch')
+        if not columns:
+            raise Exception(f"{self.name_srs_table} not found, is {self.path_to_srs_db} a houhou export?")
 
-                                   ELSE NULL
-                               END;
-                           """
+        new_cols = [(name_col + "ISO", "TEXT") for name_col in names_date_col if name_col + "ISO" not in columns]
 
-            try:
-                self.conn.execute(q_create_col)
-                self.conn.execute(q_update_col)
+        if self.col_dict["due_epoch_col"] not in columns:
+            new_cols.append((self.col_dict["due_epoch_col"], "INTEGER"))
+
+        self.ensure_migration_table()
+        checkpoint = self.conn.execute(f"SELECT LastRowid, Finished FROM {self.name_migration_table} WHERE Name = 'houhou';").fetchone()
+
+        # converted before checkpoints existed (the iso columns are there and filled, but nothing was recorded)
+        # a houhou date without its iso copy means they were only added, so it starts over
+        if checkpoint is None and not any(name_col.endswith("ISO") for name_col, _ in new_cols):
+            next_answer_col = self.col_dict["houhou_next_answer_col"]
+            is_unconverted = self.conn.execute(f"""
+                                               SELECT EXISTS (
+                                                   SELECT 1 FROM {self.name_srs_table}
+                                                   WHERE typeof({next_answer_col}) = 'integer'
+                                                   AND {next_answer_col}ISO IS NULL
+                                               );
+                                               """).fetchone()[0]
+
+            if not is_unconverted:
+                checkpoint = (0, 1)
+
+        last_rowid, is_finished = checkpoint or (0, 0)
+
+        min_rowid, max_rowid = self.conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {self.name_srs_table} WHERE rowid > ?;", (last_rowid,)).fetchone()
+        total = 0 if is_finished else self.conn.execute(f"SELECT COUNT(*) FROM {self.name_srs_table} WHERE rowid > ?;", (last_rowid,)).fetchone()[0]
+
+        summary = {
+            "new_columns": [name_col for name_col, _ in new_cols],
+            "rows": total,
+            "chunks": -(-total // chunk_size) if total and min_rowid is not None else 0,
+            "resumed_after": last_rowid,
+            "seconds": 0.0,
+        }
+
+        def to_iso(name_col: str) -> str:
+            return f"""
+                   CASE
+                       WHEN typeof({name_col}) = 'text'
+                       AND {name_col} GLOB '20[0-9][0-9]-*' THEN
+                           {name_col}
+
+                       WHEN typeof({name_col}) = 'integer' THEN
+                           datetime(({name_col} / 10000000) - 62135596800, 'unixepoch')
+
+                       ELSE NULL
+                   END
+                   """
+
+        # the old values are read on the right hand side, so the epoch is computed from houhou's column too
+        next_answer_col = self.col_dict["houhou_next_answer_col"]
+        q_update_chunk = f"""
+                         UPDATE {self.name_srs_table}
+                         SET
+                             {", ".join(f"{name_col}ISO = {to_iso(name_col)}" for name_col in names_date_col)},
+                             {self.col_dict["due_epoch_col"]} = CAST(strftime('%s', {to_iso(next_answer_col)}) AS INTEGER)
+                         WHERE rowid BETWEEN ? AND ?;
+                         """
+        q_checkpoint = f"""
+                       INSERT INTO {self.name_migration_table} (Name, LastRowid, Finished)
+                       VALUES ('houhou', ?, ?)
+                       ON CONFLICT (Name) DO UPDATE SET
+                           LastRowid = excluded.LastRowid,
+                           Finished = excluded.Finished;
+                       """
+
+        # nothing of ours may be sitting in the open transaction
+        self.force_commit()
+
+        if dry_run:
+            if summary["chunks"]:
+                start = time.perf_counter()
+
+                self.conn.execute("SAVEPOINT houhou_dry_run;")
+
+                try:
+                    for name_col, col_type in new_cols:
+                        self.conn.execute(f"ALTER TABLE {self.name_srs_table} ADD COLUMN {name_col} {col_type};")
 
+                    self.conn.execute(q_update_chunk, (min_rowid, min_rowid + chunk_size - 1))
+
+                finally:
+                    self.conn.execute("ROLLBACK TO houhou_dry_run;")
+                    self.conn.execute("RELEASE houhou_dry_run;")
+
+                summary["seconds"] = (time.perf_counter() - start) * summary["chunks"]
+
+            return summary
+
+        start = time.perf_counter()
+
+        # the columns and the first checkpoint go in together, so an interruption before the first chunk
+        # can't leave empty columns behind that look like an earlier conversion
+        self.conn.execute("BEGIN;")
+
+        for name_col, col_type in new_cols:
+            self.conn.execute(f"ALTER TABLE {self.name_srs_table} ADD COLUMN {name_col} {col_type};")
+
+        if checkpoint is None:
+            self.conn.execute(q_checkpoint, (0, 0))
+
+        self.conn.commit()
+
+        done = 0
+
+        if not is_finished and min_rowid is not None:
+            for chunk_start in range(min_rowid, max_rowid + 1, chunk_size):
+                chunk_end = min(chunk_start + chunk_size - 1, max_rowid)
+
+                cursor = self.conn.execute(q_update_chunk, (chunk_start, chunk_end))
+                self.conn.execute(q_checkpoint, (chunk_end, 0))
                 self.conn.commit()
 
-            # don't raise the error
-            # most likely it's just saying the column exists if you run this function multiple times
-            except Exception as e:
-                print(f"{name_col}: {e}")
+                # sparse rowids make some chunks smaller than others
+                done += max(cursor.rowcount, 0)
 
-                continue
+                if progress is not None:
+                    progress(done, total)
 
-        return None
+        self.conn.execute(q_checkpoint, (max_rowid or last_rowid, 1))
+        self.conn.commit()
+
+        summary["seconds"] = time.perf_counter() - start
+
+        # the epoch column and the due index need the columns made above
+        self.ensure_due_epoch_column()
+        self.ensure_indexes()
+
+        # only if this process has caches to keep (main.py migrate doesn't load them)
+        if self.stats_cache.valid:
+            self.rebuild_stats_cache()
+
+        if self.meaning_index.valid:
+            self.rebuild_meaning_index()
+
+        return summary
@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+
+# end of today in local time
+def end_of_local_day() -> datetime:
+    local_now = datetime.now().astimezone()
+
+    return local_now.replace(hour = 0, minute = 0, second = 0, microsecond = 0) + timedelta(days = 1, seconds = -1)
+
+# in-memory copy of everything /stats shows, kept up to date by the app's writes
+# due counts depend on the clock, so next review dates (unix epochs) are kept sorted and counted with a bisect
+class StatsCache:
+    def __init__(self, max_srs_grade: int):
+        self.max_srs_grade = max_srs_grade
+        self.reset()
+
+    def reset(self) -> None:
+        self.valid = False
+        self.grade_counts = Counter()
+        self.success_count = 0
+        self.failure_count = 0
+
+        # item id -> (grade, next review date), needed to undo an item's old state
+        self.items = dict()
+        self.due_dates = []
+
+        return None
+
+    # rows of (id, grade, success count, failure count, next review epoch)
+    def rebuild(self, rows: list) -> None:
+        self.reset()
+
+        for item_id, grade, success_count, failure_count, next_answer_date in rows:
+            self.items[item_id] = (grade, next_answer_date)
+            self.grade_counts[grade] += 1
+            self.success_count += success_count or 0
+            self.failure_count += failure_count or 0
+
+            if next_answer_date is not None:
+                self.due_dates.append(next_answer_date)
+
+        self.due_dates.sort()
+        self.valid = True
+
+        return None
+
+    # an item was added or its grade/date changed
+    def set_item(self, item_id: int, grade: int, next_answer_date: int) -> None:
+        previous = self.items.get(item_id)
+
+        if previous is not None:
+            previous_grade, previous_date = previous
+            self.grade_counts[previous_grade] -= 1
+
+            if previous_date is not None:
+                index = bisect_left(self.due_dates, previous_date)
+
+                if index < len(self.due_dates) and self.due_dates[index] == previous_date:
+                    del self.due_dates[index]
+
+        self.items[item_id] = (grade, next_answer_date)
+        self.grade_counts[grade] += 1
+
+        if next_answer_date is not None:
+            insort(self.due_dates, next_answer_date)
+
+        return None
+
+    def add_result(self, res: bool) -> None:
+        if res:
+            self.success_count += 1
+
+        else:
+            self.failure_count += 1
+
+        return None
+
+    def count_due_before(self, when: datetime) -> int:
+        return bisect_left(self.due_dates, int(when.timestamp()))
+
+    def summary(self) -> dict:
+        now = datetime.now(timezone.utc)
+        end_of_day = end_of_local_day()
+
+        total = self.success_count + self.failure_count
+
+        return {
+            "grade_counts": [self.grade_counts[grade] for grade in range(self.max_srs_grade + 1)],
+            "due_now": self.count_due_before(now),
+            "due_today": self.count_due_before(end_of_day),
+            "ratio": self.success_count / total if total else 0,
+        }